@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the per-line overhead that `esigen.io.GaussianParser` adds on
+top of the cclib Gaussian parser, comparing the prefix-dispatch table
+against the previous implementation (every check run on every line).
+
+Usage: python bench_gaussian_dispatch.py [LOGFILE] [REPEATS]
+
+By default, `tests/data/meoh_opt_freq.log` (a Gaussian 09 opt+freq job)
+is used. Pass a larger Gaussian logfile for more stable timings.
+"""
+
+from __future__ import division, print_function, absolute_import
+import os
+import sys
+import timeit
+import logging
+import warnings
+warnings.simplefilter('ignore')
+from cclib.parser import Gaussian
+from esigen.io import GaussianParser, ccDataExtended
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+DEFAULT = os.path.join(HERE, '..', '..', 'tests', 'data', 'meoh_opt_freq.log')
+
+
+class LegacyGaussianParser(GaussianParser):
+
+    """
+    Previous implementation of GaussianParser.extract, kept as reference.
+    """
+
+    def extract(self, inputfile, line):
+        try:
+            if "Stoichiometry" in line:
+                line = self._extract_stoichiometry(inputfile, line)
+            if "Sum of electronic and zero-point Energies=" in line:
+                line = self._extract_zeropointenergy(inputfile, line)
+            if "Sum of electronic and thermal Energies" in line:
+                line = self._extract_thermalenergy(inputfile, line)
+            if "alpha electrons" in line:
+                line = self._extract_electrons(inputfile, line)
+            if line.strip().startswith('#') and not hasattr(self, 'route'):
+                line = self._extract_route(inputfile, line)
+            if line[:2] == ' !' and "Scan" in line:
+                line = self._extract_modredundant(inputfile, line)
+            if hasattr(self, 'modredenergies'):
+                if line[1:9] == 'Variable':
+                    line = self._extract_modredenergies(inputfile, line)
+                if 'Optimized Parameters' in line:
+                    line = self._extract_modredvalues(inputfile, line)
+            if line[1:23] == 'Cartesian Forces:  Max':
+                line = self._extract_maxcartesianforces(inputfile, line)
+            if line[1:23] == 'Solvent              :':
+                line = self._extract_solvent(inputfile, line)
+            Gaussian.extract(self, inputfile, line)
+        except Exception as e:
+            self.logger.error('Line could not be parsed! '
+                              'Job will continue, but errors may arise')
+            self.logger.error('  Exception: %s', e)
+            self.logger.error('  Line: %s', line)
+
+
+def parse(cls, path):
+    return cls(path, datatype=ccDataExtended, loglevel=logging.CRITICAL).parse()
+
+
+def bench(path, repeats, nlines):
+    timings = {}
+    for label, cls in (('cclib Gaussian', Gaussian),
+                       ('legacy esigen', LegacyGaussianParser),
+                       ('dispatch esigen', GaussianParser)):
+        timings[label] = min(timeit.repeat(lambda: parse(cls, path), number=1, repeat=repeats))
+    base = timings['cclib Gaussian']
+    for label, seconds in sorted(timings.items(), key=lambda kv: kv[1]):
+        print('  {:<16} {:8.3f} s  ({:+.3f} us/line vs cclib)'.format(
+              label, seconds, 1e6 * (seconds - base) / nlines))
+    print('  Speedup (legacy / dispatch): {:.2f}x'.format(
+          timings['legacy esigen'] / timings['dispatch esigen']))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with open(path) as f:
+        nlines = sum(1 for _ in f)
+    print('File: {} ({} lines, best of {})'.format(os.path.basename(path), nlines, repeats))
+    print('Whole parse')
+    bench(path, repeats, nlines)
+    # Same thing, but without the cclib handlers, so only the esigen layer is timed
+    print('esigen layer only (cclib Gaussian.extract disabled)')
+    extract = Gaussian.extract
+    Gaussian.extract = lambda self, inputfile, line: None
+    try:
+        bench(path, repeats, nlines)
+    finally:
+        Gaussian.extract = extract
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the cold start of the command-line tools: the wall time of a
+fresh interpreter running each command, and which heavy modules it ends
+up importing. Commands that should not need the parsing machinery (the
+help of `esigen` and `esixyz`, or just importing the package) fail the
+benchmark if they import any of `HEAVY`.
+
+Usage: python bench_imports.py [LOGFILE] [REPEATS]
+
+If LOGFILE is given, `esixyz LOGFILE` (last frame) is timed too.
+"""
+
+from __future__ import division, print_function, absolute_import
+import os
+import subprocess
+import sys
+import timeit
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+ROOT = os.path.join(HERE, '..', '..')
+HEAVY = ('cclib', 'numpy', 'jinja2', 'markdown', 'pymol', 'flask')
+SCRIPT = """
+import sys
+sys.argv = {argv!r}
+try:
+    {statement}
+except SystemExit:
+    pass
+sys.stderr.write(repr(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+# (label, argv, statement, heavy modules allowed)
+COMMANDS = (
+    ('import esigen', [], 'import esigen', False),
+    ('esigen -h', ['esigen', '-h'], 'from esigen.cli import main; main()', False),
+    ('esixyz -h', ['esixyz', '-h'], 'from esigen.cli import esixyz; esixyz()', False),
+    ('esigen --version', ['esigen', '--version'], 'from esigen.cli import main; main()', False),
+)
+
+
+def run(argv, statement):
+    code = SCRIPT.format(argv=argv, statement=statement, heavy=HEAVY)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    process = subprocess.Popen([sys.executable, '-c', code], env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = process.communicate()
+    return err.decode('utf-8').strip().splitlines()[-1]
+
+
+def main():
+    commands = list(COMMANDS)
+    if len(sys.argv) > 1:
+        path = os.path.abspath(sys.argv[1])
+        commands.append(('esixyz LOGFILE', ['esixyz', path],
+                         'from esigen.cli import esixyz; esixyz()', True))
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    baseline = min(timeit.repeat(lambda: run([], 'pass'), number=1, repeat=repeats))
+    print('Bare interpreter: {:.3f} s (best of {})'.format(baseline, repeats))
+    failed = []
+    for label, argv, statement, heavy_allowed in commands:
+        imported = run(argv, statement)
+        seconds = min(timeit.repeat(lambda: run(argv, statement), number=1, repeat=repeats))
+        print('  {:<18} {:7.3f} s  (+{:.3f} s)  heavy modules: {}'.format(
+              label, seconds, seconds - baseline, imported))
+        if not heavy_allowed and imported != '[]':
+            failed.append(label)
+    if failed:
+        sys.exit('Heavy modules imported by: {}'.format(', '.join(failed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the rendering of the builtin templates in the Jinja sandbox
+against the trusted (plain Jinja) environment. The file is parsed once
+and the templates are compiled before timing, so only the render itself
+is measured (as the web server does, with `missing='N/A'`).
+
+Usage: python bench_render.py [LOGFILE] [REPEATS] [NUMBER]
+
+By default, `tests/data/opt_amber.log` is used.
+"""
+
+from __future__ import division, print_function, absolute_import
+import os
+import sys
+import timeit
+import logging
+import warnings
+warnings.simplefilter('ignore')
+from esigen import ESIgenReport
+from esigen.templating import BUILTIN_TEMPLATES, precompile
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+DEFAULT = os.path.join(HERE, '..', '..', 'tests', 'data', 'opt_amber.log')
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    number = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    report = ESIgenReport(path, missing='N/A', loglevel=logging.CRITICAL)
+    precompile()
+    precompile(trusted=True)
+    print('File: {} (ms per render, best of {} x {})'.format(os.path.basename(path), repeats, number))
+    print('  {:<14} {:>12} {:>12} {:>8}'.format('Template', 'Sandbox', 'Trusted', 'Speedup'))
+    for template in BUILTIN_TEMPLATES:
+        timings = []
+        for trusted in (False, True):
+            try:
+                render = lambda: report.report(template=template, trusted=trusted)
+                render()
+                seconds = min(timeit.repeat(render, number=number, repeat=repeats))
+                timings.append(1e3 * seconds / number)
+            except Exception as e:  # templates that do not apply to this file
+                timings.append(None)
+                error = e
+        if None in timings:
+            print('  {:<14} could not be rendered: {}'.format(template, error))
+            continue
+        print('  {:<14} {:12.3f} {:12.3f} {:7.2f}x'.format(template, timings[0], timings[1],
+                                                           timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the array-based structure writers of `esigen.writers` and the
+element tables of `esigen.utils` against the previous per-atom
+implementations of `ccDataExtended` (XYZ, PDB, atoms), `cclib.io.CML`
+and `cclib.method.Nuclear` (stoichiometry), for systems of increasing size.
+Outputs are checked to be identical before timing them.
+
+Usage: python bench_writers.py [MAX_ATOMS] [REPEATS]
+
+By default, systems from 100 to 100000 atoms are tested.
+"""
+
+from __future__ import division, print_function, absolute_import
+import sys
+import timeit
+import warnings
+from collections import defaultdict
+warnings.simplefilter('ignore')
+import numpy as np
+from cclib.io import CML
+from cclib.method import Nuclear
+from esigen import writers
+from esigen.io import ccDataExtended
+from esigen.utils import ELEMENTS, PERIODIC_TABLE, stoichiometry
+
+ATOMIC_NUMBERS = np.array([1, 1, 6, 7, 8, 16, 17, 26, 30])
+
+
+def legacy_xyz(atoms, coords):
+    return '\n'.join(['{:4} {: 15.6f} {: 15.6f} {: 15.6f}'.format(a, *xyz)
+                      for (a, xyz) in zip(atoms, coords)])
+
+
+def legacy_pdb(atoms, coords):
+    s = ('{field:<6}{serial_number:>5d} '
+         '{atom_name:^4}{alt_loc_indicator:<1}{res_name:<3} '
+         '{chain_id:<1}{res_seq_number:>4d}{insert_code:<1}   '
+         '{x_coord: >8.3f}{y_coord: >8.3f}{z_coord: >8.3f}'
+         '{occupancy:>6.2f}{temp_factor:>6.2f}          '
+         '{element:>2}{charge:>2}')
+    default = {'alt_loc_indicator': '', 'res_name': 'UNK', 'chain_id': '',
+               'res_seq_number': 1, 'insert_code': '', 'occupancy': 1.0,
+               'temp_factor': 0.0, 'charge': ''}
+    pdb = ['TITLE unknown', 'MODEL 1']
+    counter = defaultdict(int)
+    for i, (element, (x, y, z)) in enumerate(zip(atoms, coords)):
+        field = 'ATOM' if element.upper() in 'CHONPS' else 'HETATM'
+        counter[element] += 1
+        pdb.append(s.format(field=field, serial_number=i + 1, element=element,
+                            atom_name='{}{}'.format(element, counter[element]),
+                            x_coord=x, y_coord=y, z_coord=z, **default))
+    pdb.append('ENDMDL\nEND\n')
+    return '\n'.join(pdb)
+
+
+def system(natom, seed=0):
+    rng = np.random.RandomState(seed)
+    data = ccDataExtended(attributes={
+        'natom': natom, 'charge': 0, 'mult': 1,
+        'atomnos': rng.choice(ATOMIC_NUMBERS, natom),
+        'atomcoords': rng.uniform(-50, 50, (1, natom, 3))})
+    data.arrayify()
+    return data
+
+
+def bench(natom, repeats):
+    data = system(natom)
+    atoms, coords = data.atoms, data.coordinates
+    atomnos = data.atomnos
+    cases = (('Atoms', lambda: [PERIODIC_TABLE.element[n] for n in atomnos],
+              lambda: ELEMENTS[atomnos].tolist()),
+             ('Formula', lambda: Nuclear(data).stoichiometry(),
+              lambda: stoichiometry(atomnos, data.charge)),
+             ('XYZ', lambda: legacy_xyz(atoms, coords), lambda: writers.xyz(atoms, coords)),
+             ('PDB', lambda: legacy_pdb(atoms, coords), lambda: writers.pdb(atoms, coords)),
+             ('CML', lambda: CML(data).generate_repr(), lambda: writers.cml(atoms, coords)))
+    for label, legacy, vectorized in cases:
+        assert legacy() == vectorized(), '{} outputs differ'.format(label)
+        before = min(timeit.repeat(legacy, number=1, repeat=repeats))
+        after = min(timeit.repeat(vectorized, number=1, repeat=repeats))
+        print('  {:>7d} atoms  {:<7}  {:9.4f} s -> {:9.4f} s  ({:.1f}x)'.format(
+              natom, label, before, after, before / after))
+
+
+def main():
+    max_atoms = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    natom = 100
+    while natom <= max_atoms:
+        bench(natom, repeats)
+        natom *= 10
+
+
+if __name__ == '__main__':
+    main()
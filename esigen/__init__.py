@@ -5,7 +5,26 @@
 Generate supporting information reports for computational chemistry publications.
 """
 
-from .core import ESIgenReport
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+import sys
+
+if sys.version_info >= (3, 7):
+    # Importing `esigen` (i.e. to reach `esigen.cli`) stays cheap: the parsing
+    # machinery and the version (which may call git) are loaded on first use
+    def __getattr__(name):
+        if name == 'ESIgenReport':
+            from .core import ESIgenReport
+            globals()['ESIgenReport'] = ESIgenReport
+            return ESIgenReport
+        if name == '__version__':
+            from ._version import get_versions
+            globals()['__version__'] = version = get_versions()['version']
+            return version
+        raise AttributeError("module 'esigen' has no attribute '{}'".format(name))
+
+    def __dir__():
+        return sorted(list(globals()) + ['ESIgenReport', '__version__'])
+else:
+    from .core import ESIgenReport
+    from ._version import get_versions
+    __version__ = get_versions()['version']
+    del get_versions
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Batch processing of many logfiles on a pool of processes.
+
+`process` parses and renders each file in a worker process and yields a
+`BatchResult` per file, as soon as it is available (or in the original
+order, if requested). Failures are reported in the corresponding result
+instead of interrupting the whole batch. With `output`, workers write each
+report to a file as it is rendered, so big batches do not need to keep
+every report in memory.
+
+Instead of pickling the `ESIgenReport` objects, workers send back the
+parsed data and the rendered report (or the path to its file), and the
+`ESIgenReport` is rebuilt around them in the calling process.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+import io
+import os
+import logging
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+# Own
+from .core import ESIgenReport
+from .utils import strip_compression
+
+logger = logging.getLogger(__name__)
+
+
+class BatchResult(namedtuple('BatchResult', 'path molecule report error')):
+
+    """
+    Outcome of processing a file in a batch.
+
+    Attributes
+    ----------
+    path : str
+        The processed file.
+    molecule : ESIgenReport or None
+        Reporter holding the parsed data. None if processing failed.
+    report : str or None
+        The rendered report, or the path to the file it was written to if
+        `process` was given an `output` directory. None if processing failed.
+    error : str or None
+        Reason why the file could not be processed, if any.
+    """
+
+    __slots__ = ()
+
+
+def _process(task):
+    """
+    Parse and render a file. Runs in the worker processes.
+    """
+    path, reporter, template, reporter_kwargs, report_kwargs, output = task
+    try:
+        molecule = reporter(path, **reporter_kwargs)
+        if output is None:
+            report = molecule.report(template=template, **report_kwargs)
+        else:
+            report = output
+            with io.open(output, 'w', encoding='utf-8') as f:
+                molecule.write_report(f, template=template, **report_kwargs)
+    except Exception as e:
+        logger.debug('Could not process %s', path, exc_info=True)
+        return path, None, None, None, '{}: {}'.format(e.__class__.__name__, e)
+    return path, molecule.data, molecule.parse_errors, report, None
+
+
+def _result(processed, reporter, reporter_kwargs):
+    """
+    Rebuild the reporter of a processed file around its parsed data and
+    the summary of its parse errors.
+    """
+    path, data, parse_errors, report, error = processed
+    if error is not None:
+        return BatchResult(path, None, None, error)
+    # Options that only make sense with the default parsing logic
+    kwargs = dict((k, v) for (k, v) in reporter_kwargs.items()
+                  if k not in ('cache', 'quick', 'resume'))
+    molecule = reporter(path, parser=lambda *args, **kwargs: data, **kwargs)
+    molecule.parse_errors = parse_errors
+    return BatchResult(path, molecule, report, None)
+
+
+def _output_paths(paths, output):
+    """
+    Report file of each path in `output`, named after the logfile (as
+    `ESIgenReport.name`) and unique within the batch.
+    """
+    outputs, seen = [], set()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(strip_compression(path)))[0]
+        filename, i = name + '.md', 0
+        while filename in seen:
+            i += 1
+            filename = '{}_{}.md'.format(name, i)
+        seen.add(filename)
+        outputs.append(os.path.join(output, filename))
+    return outputs
+
+
+def process(paths, template='default.md', reporter=ESIgenReport, processes=None,
+            ordered=False, reporter_kwargs=None, report_kwargs=None, output=None):
+    """
+    Parse and render several files in parallel.
+
+    Parameters
+    ----------
+    paths : list of str
+        Logfiles to process.
+    template : str, optional='default.md'
+        Template used to render each report (see `ESIgenReport.report`).
+    reporter : ESIgenReport or subclass, optional
+        Class used to parse each file. It must be importable (picklable).
+    processes : int, optional
+        Number of worker processes. Defaults to the number of CPUs. With 1,
+        or a single file, everything runs in the calling process.
+    ordered : bool, optional=False
+        Yield the results in the same order as `paths`. Otherwise, they are
+        yielded as soon as they are ready.
+    reporter_kwargs : dict, optional
+        Keyword arguments for `reporter` (i.e. `missing`, `fields`, `cache`).
+    report_kwargs : dict, optional
+        Keyword arguments for `ESIgenReport.report` (i.e. `preview`).
+    output : str, optional
+        Directory where each report is written while it is rendered, as
+        `<name>.md` (`<name>_1.md`, `<name>_2.md`... for files that share
+        their name, like `job.log` and `job.out`). The results then hold
+        the path to the file, not the report.
+
+    Yields
+    ------
+    result : BatchResult
+        One per file. Check `result.error` before using it.
+    """
+    reporter_kwargs = reporter_kwargs or {}
+    report_kwargs = report_kwargs or {}
+    outputs = _output_paths(paths, output) if output is not None else [None] * len(paths)
+    tasks = [(path, reporter, template, reporter_kwargs, report_kwargs, out)
+             for (path, out) in zip(paths, outputs)]
+    if processes == 1 or len(tasks) < 2:
+        for task in tasks:
+            yield _result(_process(task), reporter, reporter_kwargs)
+        return
+    pool = Pool(processes=min(processes or cpu_count(), len(tasks)))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for processed in imap(_process, tasks, chunksize=1):
+            yield _result(processed, reporter, reporter_kwargs)
+        pool.close()
+    finally:
+        # Kill the workers if the consumer stopped early
+        pool.terminate()
+        pool.join()
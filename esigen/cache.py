@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent, content-addressed cache of parsed logfiles.
+
+Parsing a big logfile with cclib can take several seconds, while the
+resulting `ccData` object is usually a handful of NumPy arrays. The
+`ParseCache` class stores those arrays on disk, keyed by the SHA1 of
+the logfile contents plus the versions of ESIgen and cclib (and the
+datatype in use), so any change in the file or in the parsing logic
+invalidates the entry automatically.
+
+Each entry is a directory containing:
+
+- One `.npy` file per numeric array attribute (`atomcoords`, `scfenergies`...).
+  Lists of numeric arrays (`scfvalues`, `moenergies`...) are stored as one
+  `.npy` file per item. These are loaded memory-mapped, so only the pages
+  actually touched by the templates are read from disk.
+- `attributes.pkl`, with the remaining (non-array) attributes and the
+  manifest of array files.
+
+The cache location can be set with the `ESIGEN_CACHE_DIR` environment
+variable. By default, `$XDG_CACHE_HOME/esigen` (`~/.cache/esigen`) is used.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+import os
+import shutil
+import hashlib
+import logging
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+# 3rd party
+import numpy as np
+
+logger = logging.getLogger(__name__)
+_NUMERIC_KINDS = 'biufc'
+_MANIFEST = 'attributes.pkl'
+
+
+def default_cache_dir():
+    """
+    Location of the cache, as configured by the environment.
+    """
+    path = os.environ.get('ESIGEN_CACHE_DIR')
+    if not path:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'esigen')
+    return path
+
+
+def file_digest(path, blocksize=1 << 20):
+    """
+    SHA1 hexdigest of the contents of `path`, read in blocks of `blocksize` bytes.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _is_numeric_array(value):
+    return isinstance(value, np.ndarray) and value.dtype.kind in _NUMERIC_KINDS
+
+
+class ParseCache(object):
+
+    """
+    On-disk cache of `ccData`-like objects.
+
+    Parameters
+    ----------
+    root : str, optional
+        Directory where the entries will be stored. Defaults to
+        `default_cache_dir()`.
+    mmap : bool, optional=True
+        Whether to load array attributes memory-mapped (read-only)
+        instead of reading them in memory.
+    """
+
+    def __init__(self, root=None, mmap=True):
+        if root is None:
+            root = default_cache_dir()
+        self.root = root
+        self.mmap_mode = 'r' if mmap else None
+
+    def key(self, path, datatype, fields=None, digest=None):
+        """
+        Compute the cache key of a logfile, which depends on its contents,
+        the datatype used to hold the parsed data, and the versions of
+        both ESIgen and cclib.
+
+        Parameters
+        ----------
+        path : str
+            The logfile.
+        datatype : class
+            Class that holds the parsed data.
+        fields : collection of str, optional
+            Only these attributes were parsed. Partial parses are stored
+            under their own key (one per set of fields).
+        digest : str, optional
+            `file_digest(path)`, if already known.
+        """
+        from cclib import __version__ as cclib_version
+        from . import __version__ as esigen_version
+        if digest is None:
+            digest = file_digest(path)
+        sha1 = hashlib.sha1(digest.encode('ascii'))
+        for token in (esigen_version, cclib_version,
+                      datatype.__module__, datatype.__name__):
+            sha1.update(str(token).encode('utf-8'))
+        if fields is not None:
+            sha1.update('\0fields:{}'.format(','.join(sorted(fields))).encode('utf-8'))
+        return sha1.hexdigest()
+
+    def entry(self, key):
+        """
+        Directory that holds the entry identified by `key`.
+        """
+        return os.path.join(self.root, key[:2], key)
+
+    def load(self, key, datatype):
+        """
+        Rebuild the `datatype` instance stored under `key`.
+
+        Returns
+        -------
+        data : datatype instance or None
+            None is returned if the entry is not present or cannot be read.
+        """
+        entry = self.entry(key)
+        try:
+            with open(os.path.join(entry, _MANIFEST), 'rb') as f:
+                manifest = pickle.load(f)
+            attributes = manifest['attributes']
+            for name in manifest['arrays']:
+                attributes[name] = self._load_array(entry, name)
+            for name, length in manifest['arraylists'].items():
+                attributes[name] = [self._load_array(entry, '{}.{}'.format(name, i))
+                                    for i in range(length)]
+        except (IOError, OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError) as e:
+            if os.path.isdir(entry):
+                logger.warning('Ignoring unreadable cache entry %s: %s', entry, e)
+            return None
+        # Do not go through ccData.setattributes: values are already arrayified
+        # and, for example, ccData_optdone_bool would choke on a boolean optdone
+        data = datatype()
+        for name, value in attributes.items():
+            setattr(data, name, value)
+        return data
+
+    def _load_array(self, entry, name):
+        return np.load(os.path.join(entry, name + '.npy'), mmap_mode=self.mmap_mode,
+                       allow_pickle=False)
+
+    def store(self, key, data):
+        """
+        Save the attributes of `data` (listed in its `_attrlist`) under `key`.
+        Entries are written to a temporary directory first and then moved
+        in place, so concurrent readers never see partial entries.
+        """
+        entry = self.entry(key)
+        if os.path.isdir(entry):
+            return entry
+        tmp = '{}.tmp-{}'.format(entry, os.getpid())
+        manifest = {'attributes': {}, 'arrays': [], 'arraylists': {}}
+        try:
+            if not os.path.isdir(tmp):
+                os.makedirs(tmp)
+            for name in data._attrlist:
+                if not hasattr(data, name):
+                    continue
+                value = getattr(data, name)
+                if _is_numeric_array(value):
+                    np.save(os.path.join(tmp, name + '.npy'), value)
+                    manifest['arrays'].append(name)
+                elif (isinstance(value, (list, tuple)) and value
+                      and all(_is_numeric_array(v) for v in value)):
+                    for i, v in enumerate(value):
+                        np.save(os.path.join(tmp, '{}.{}.npy'.format(name, i)), v)
+                    manifest['arraylists'][name] = len(value)
+                else:
+                    manifest['attributes'][name] = value
+            with open(os.path.join(tmp, _MANIFEST), 'wb') as f:
+                pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, entry)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            # Another process may have won the race, or the cache is not writable
+            if not os.path.isdir(entry):
+                logger.warning('Could not write cache entry %s: %s', entry, e)
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+        return entry
+
+    def clear(self):
+        """
+        Remove all the entries in the cache.
+        """
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+
+def get_cache(cache):
+    """
+    Normalize the `cache` option accepted by `ESIgenReport`.
+
+    Parameters
+    ----------
+    cache : None, bool, str or ParseCache
+        None or False disable caching. True uses the default location.
+        A string is interpreted as the cache directory.
+    """
+    if cache is None or cache is False:
+        return None
+    if cache is True:
+        return ParseCache()
+    if isinstance(cache, ParseCache):
+        return cache
+    return ParseCache(root=cache)
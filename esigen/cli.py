@@ -18,22 +18,32 @@ import shutil
 import subprocess
 import sys
 import logging
-from esigen import ESIgenReport, __version__
-from esigen.core import BUILTIN_TEMPLATES
-from esigen.utils import greeting
+# Only the list of templates is needed to parse the arguments. The parsing
+# machinery (cclib, NumPy, Jinja2...) is imported once it is really used.
+from esigen.templating import BUILTIN_TEMPLATES, template_fields, template_variables
 
 
 ####
 # esigen
 ####
 
-def run(path, template='default.md', missing=None, preview=True, reporter=ESIgenReport,
-        verbose=False):
+def run(path, template='default.md', missing=None, preview=True, reporter=None,
+        verbose=False, cache=None, quick=False, resume=False, split=False, trusted=False,
+        processes=None):
+    if reporter is None:
+        from esigen.core import ESIgenReport as reporter
     if preview is True:
         preview = 'static'
     loglevel = logging.INFO if verbose else logging.CRITICAL
-    r = reporter(path, missing=missing, loglevel=loglevel)
-    return r.report(template=template, preview=preview)
+    fields = template_fields(template)
+    if split:
+        reports = reporter.from_jobs(path, processes=processes, missing=missing,
+                                     loglevel=loglevel, fields=fields)
+        return '\n'.join(r.report(template=template, preview=preview, trusted=trusted)
+                         for r in reports)
+    r = reporter(path, missing=missing, loglevel=loglevel, cache=cache,
+                 fields=fields, quick=quick, resume=resume)
+    return r.report(template=template, preview=preview, trusted=trusted)
 
 
 def parse_args():
@@ -52,39 +62,207 @@ def parse_args():
                              'to disable.')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Switch logging level to info for detailed debugging.')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse parsed data from previous runs, stored in '
+                             '$ESIGEN_CACHE_DIR or ~/.cache/esigen (see --cache-dir).')
+    parser.add_argument('--cache-dir', metavar='DIR', default=None,
+                        help='Directory used by --cache instead of the default one. '
+                             'Implies --cache.')
+    parser.add_argument('--quick', action='store_true',
+                        help='Only parse the last step of each job (final energy and '
+                             'geometry), reading the file from the end. Useful to '
+                             'triage big logfiles.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Save the parser state in $ESIGEN_CACHE_DIR/resume or '
+                             '~/.cache/esigen/resume (see --resume-dir), so the next run '
+                             'on the same files only parses the output appended since '
+                             'then. Ideal for running jobs.')
+    parser.add_argument('--resume-dir', metavar='DIR', default=None,
+                        help='Directory used by --resume instead of the default one. '
+                             'Implies --resume.')
+    parser.add_argument('--split', action='store_true',
+                        help='Report on each job of multi-step files (i.e. Gaussian '
+                             '--Link1--) separately. The jobs of each file are '
+                             'parsed in parallel (see -j).')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=None,
+                        help='Number of processes used to parse the files (or, with '
+                             '--split, the jobs of each file). Defaults to the number '
+                             'of CPUs.')
+    parser.add_argument('--profile-parser', action='store_true',
+                        help='Print the lines matched, the lines consumed and the time '
+                             'spent by each parser handler, slowest first, to stderr. '
+                             'Files are parsed in full, one after another.')
     parser.add_argument('-q', '--quiet', action='store_true',
                         help='Do not print greeting with authors, version and citation info.')
-    parser.add_argument('--version', action='version',
-                        version='%(prog)s v{}'.format(__version__))
-    return parser.parse_args()
+    parser.add_argument('--version', action=VersionAction)
+    args = parser.parse_args()
+    if args.split:
+        # The jobs of each file are parsed in full and not cached
+        unsupported = [option for (option, value) in
+                       (('--cache', args.cache), ('--cache-dir', args.cache_dir),
+                        ('--quick', args.quick), ('--resume', args.resume),
+                        ('--resume-dir', args.resume_dir),
+                        ('--profile-parser', args.profile_parser)) if value]
+        if unsupported:
+            parser.error('--split cannot be combined with {}'.format(', '.join(unsupported)))
+    return args
 
 
-def main():
+class VersionAction(argparse.Action):
+
+    """
+    Same as argparse's `version` action, but the version is only resolved
+    (which may need git) if requested.
+    """
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+                 help="show program's version number and exit"):
+        super(VersionAction, self).__init__(option_strings=option_strings, dest=dest,
+                                            default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from esigen import __version__
+        print('{} v{}'.format(parser.prog, __version__))
+        parser.exit()
+
+
+def launch_pymol(template):
+    """
+    Start PyMOL if `template` shows a static depiction of the molecule.
+
+    Returns
+    -------
+    launched : bool
+        False if the template does not need it or PyMOL is not available.
+    """
+    if 'image' not in template_variables(template):
+        return False
     try:
         import pymol
-        pymol.finish_launching(['pymol', '-qc'])
-        HAS_PYMOL = True
     except ImportError:
-        HAS_PYMOL = False
+        return False
+    pymol.finish_launching(['pymol', '-qc'])
+    return True
+
+
+def main():
     args = parse_args()
+    from esigen.batch import process
+    from esigen.utils import greeting
+    HAS_PYMOL = launch_pymol(args.template)
     if not args.quiet:
         print(greeting())
-    for path in args.paths:
-        print(run(path, args.template, preview=HAS_PYMOL, missing=args.missing,
-                  verbose=args.verbose))
+    # Templates come from whoever runs the command, so skip the sandbox
+    if args.split:
+        # Files are processed one after another, but their jobs in parallel.
+        # Reports are rendered here, so PyMOL does not limit the workers.
+        for path in args.paths:
+            print(run(path, args.template, preview=HAS_PYMOL, missing=args.missing,
+                      verbose=args.verbose, split=True, trusted=True, processes=args.jobs))
+        return
+    loglevel = logging.INFO if args.verbose else logging.CRITICAL
+    reporter_kwargs = dict(missing=args.missing, loglevel=loglevel,
+                           cache=args.cache_dir or args.cache or None,
+                           fields=template_fields(args.template), quick=args.quick,
+                           resume=args.resume_dir or args.resume)
+    report_kwargs = dict(preview='static' if HAS_PYMOL else False, trusted=True)
+    if args.profile_parser:
+        profile(args.paths, args.template, reporter_kwargs, report_kwargs)
+        return
+    # PyMOL runs in this process and cannot be shared with the workers
+    processes = 1 if HAS_PYMOL else args.jobs
+    results = process(args.paths, args.template, processes=processes, ordered=True,
+                      reporter_kwargs=reporter_kwargs, report_kwargs=report_kwargs)
+    failed = False
+    for result in results:
+        if result.error is not None:
+            print('ERROR! Could not process {}: {}'.format(result.path, result.error),
+                  file=sys.stderr)
+            failed = True
+        else:
+            print(result.report)
+            warn_parse_errors(result.path, result.molecule.parse_errors)
+    if failed:
+        sys.exit(1)
+
+
+def warn_parse_errors(path, parse_errors):
+    """
+    Tell which lines of `path` could not be parsed (see `ESIgenReport.parse_errors`).
+    """
+    if parse_errors:
+        kinds = ', '.join('{count} {exception} in {handler}'.format(**e) for e in parse_errors)
+        print('WARNING! Some lines of {} could not be parsed ({})'.format(path, kinds),
+              file=sys.stderr)
+
+
+def profile(paths, template, reporter_kwargs, report_kwargs):
+    """
+    Report on each file and print the profile of its parse to stderr.
+    Profiles are collected in this process, so the files are not parsed
+    in parallel.
+    """
+    from esigen.core import ESIgenReport
+    failed = False
+    for path in paths:
+        try:
+            report = ESIgenReport(path, profile=True, **reporter_kwargs)
+            print(report.report(template=template, **report_kwargs))
+        except Exception as e:
+            print('ERROR! Could not process {}: {}'.format(path, e), file=sys.stderr)
+            failed = True
+            continue
+        print('Parser profile of {}'.format(path), file=sys.stderr)
+        print(report.parse_profile.table(), file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 ###
 # esixyz
 ###
 
+def frame_range(value):
+    """
+    Parse a START:STOP[:STRIDE] range of steps (indexed at 1, both ends
+    included) into a slice of 0-indexed frames. A single number selects
+    that step only.
+    """
+    parts = value.split(':')
+    try:
+        if len(parts) == 1:
+            start = stop = int(value)
+            stride = None
+        elif len(parts) <= 3:
+            start, stop, stride = [int(p) if p.strip() else None
+                                   for p in parts + [''] * (3 - len(parts))]
+        else:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError('{} is not a valid range of steps'.format(value))
+    if any(n is not None and n < 1 for n in (start, stop, stride)):
+        raise argparse.ArgumentTypeError('Steps and strides must be positive numbers')
+    return slice(start - 1 if start else None, stop, stride)
+
+
 def parse_args_esixyz():
     parser = argparse.ArgumentParser(prog="esixyz",
         description='Generate XYZ files from compchem jobs')
     parser.add_argument('path', metavar='PATH', type=str,
                         help='Path to comp chem logfile.')
-    parser.add_argument('-n', dest='frame', metavar='STEP', type=int, default=0,
-                        help='Step from which to extract coordinates (indexed at 1). '
-                             'Default is 0 (last).')
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('-n', dest='frame', metavar='STEP', type=int, default=0,
+                           help='Step from which to extract coordinates (indexed at 1). '
+                                'Default is 0 (last).')
+    selection.add_argument('-f', '--frames', metavar='RANGE', type=frame_range, default=None,
+                           help='Extract several steps as a multi-frame XYZ file. '
+                                'RANGE is START:STOP[:STRIDE], indexed at 1 and with both '
+                                'ends included. Any part can be omitted (i.e. 5:, :10, ::2).')
+    selection.add_argument('-a', '--all', action='store_true',
+                           help='Extract all the steps as a multi-frame XYZ file.')
+    parser.add_argument('-c', '--converged', action='store_true',
+                        help='Only extract the steps where the optimization converged '
+                             '(i.e. each point of a relaxed scan) as a multi-frame XYZ '
+                             'file. Can be combined with --frames.')
     return parser.parse_args()
 
 
@@ -92,8 +270,26 @@ def esixyz():
     args = parse_args_esixyz()
     if args.frame < 0:
         sys.exit('ERROR! N must be 0 (last) or between 1 and the number of OPT steps')
-    report = ESIgenReport(args.path, loglevel=logging.ERROR)
-    print(report.data.xyz_from(args.frame-1))
+    import numpy as np
+    from esigen.core import ESIgenReport
+    fields = ('natom', 'atomnos', 'atomcoords', 'optstatus', 'scfenergies')
+    if args.frames is None and not args.all and not args.converged:
+        # The last frame can be obtained without parsing the whole file
+        report = ESIgenReport(args.path, loglevel=logging.ERROR, fields=fields,
+                              quick=args.frame == 0)
+        print(report.data.xyz_from(args.frame-1))
+        return
+    # Several frames are extracted from a single parse
+    data = ESIgenReport(args.path, loglevel=logging.ERROR, fields=fields).data
+    if not data.has_coordinates:
+        sys.exit('ERROR! No coordinates found in {}'.format(args.path))
+    indices = np.arange(len(data.atomcoords))[args.frames or slice(None)]
+    if args.converged:
+        indices = indices[np.isin(indices, data.converged_frames)]
+    if not len(indices):
+        sys.exit('ERROR! No steps match the requested selection')
+    for chunk in data.xyz_trajectory(indices):
+        sys.stdout.write(chunk)
 
 if __name__ == '__main__':
     main()
@@ -9,10 +9,6 @@ wrappers for Jinja2 templating and 3D image renderization.
 
 # Stdlib
 from __future__ import division, print_function, absolute_import, unicode_literals
-try:
-    import builtins
-except ImportError:
-    import __builtin__ as builtins
 import os
 import sys
 from collections import defaultdict
@@ -21,24 +17,19 @@ from itertools import chain
 import logging
 import warnings
 # 3rd party
-from cclib.io.ccio import guess_filetype
-from cclib.io import CJSONWriter
 from cclib.parser.data import ccData
-from cclib.parser.utils import convertor
-from markdown import markdown
-from jinja2 import PackageLoader
-from jinja2.sandbox import SandboxedEnvironment as Environment
-from jinja2.meta import find_undeclared_variables
-import numpy as np
 # Own
 from . import render
-from .utils import new_filename, PERIODIC_TABLE
-from .io import ccDataExtended
+from .templating import (BUILTIN_TEMPLATES, template_fields, template_info, get_environment,
+                         get_template)
+from .utils import new_filename, PERIODIC_TABLE, compression, strip_compression
+from .io import ccDataExtended, name_logfile, parse_tail, parse_jobs, sniff, guess_parser
+from .cache import get_cache, file_digest
+from .incremental import resume as resume_parser
+from .profiling import ParserProfile, timer
+from .markup import markdown_to_html
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
-__here__ = os.path.abspath(os.path.dirname(__file__))
-_lower = str.lower if sys.version_info.major == 3 else unicode.lower
-BUILTIN_TEMPLATES = sorted(os.listdir(os.path.join(__here__, 'templates')), key=_lower)
 
 
 class ESIgenReport(object):
@@ -58,16 +49,55 @@ class ESIgenReport(object):
         dict. See `esigen.io.ccDataExtended` for an example.
     datatype: cclib.parser.ccData or subclass, optional
         Use a subclass to add new fields compatible with a custom parser.
+    cache : bool, str or esigen.cache.ParseCache, optional
+        Reuse previously parsed data stored on disk (see `esigen.cache`).
+        True uses the default location; a string sets the cache directory.
+        Parses restricted to `fields` are stored under their own key, and
+        complete parses are reused for any `fields`. Only honored with the
+        default parsing logic (`parser=None`).
+    fields : iterable of str, optional
+        Only keep these data fields (attributes or properties of `datatype`).
+        Parsers that support it (see `esigen.io`) skip their own handlers for
+        the rest, but cclib's handlers (i.e. orbitals, SCF convergence) still
+        run: their unrequested attributes are only dropped after parsing.
+        Use `template_fields` to obtain the fields required by a template.
+        By default, all fields are kept.
+    quick : bool, optional=False
+        Only parse the last step of the job, reading the file backwards from
+        the end (see `esigen.io.parse_tail`). Enough for the final energy and
+        geometry, and the optimization status. If the last step is not
+        complete or the parser does not support it, the whole file is parsed.
+        Only honored with the default parsing logic (`parser=None`).
+    resume : bool or str, optional=False
+        Keep the parser state on disk, so the next report on this file only
+        parses the output appended since then (see `esigen.incremental`).
+        Useful for jobs still running. Only complete steps are reported.
+        True stores the state in the default cache location; a string sets
+        the directory. Only honored with the default parsing logic (`parser=None`).
+    sniff_limit : int, optional
+        Bytes read from the beginning of the file to guess its type. Files
+        that cannot be recognized within them are rejected. Defaults to
+        `esigen.io.SNIFF_BYTES`.
+    profile : bool, optional=False
+        Record the lines matched, the lines consumed and the time spent by
+        each handler of the parser in `ESIgenReport.parse_profile` (see
+        `esigen.profiling`). The whole file is always parsed, so `cache`
+        is not read and `quick` and `resume` are ignored. Only honored with
+        the default parsing logic (`parser=None`).
     *args, **kwargs: arguments that will be passed to `parser`
 
     Notes
     -----
     It is implemented as a wrapper around `cclib` parsers. By default, it
-    will use `cclib.ccopen` to parse the results automatically, but a
-    specific one can be chosen with the `parser` option (see above).
+    will guess the parser from the beginning of the file (see `esigen.registry`),
+    but a specific one can be chosen with the `parser` option (see above).
 
     Then the resulting `cclib.ccData`-like object is stored in `ESIgenReport.data`. A dict
-    view of this object can be obtained with `ESIgenReport.data_as_dict`.
+    view of this object can be obtained with `ESIgenReport.data_as_dict`. Lines that could
+    not be parsed are summarized in `ESIgenReport.parse_errors`, grouped by handler and
+    exception type (see `esigen.io.ParseErrors.summary`). It is None if the parser does
+    not collect them, or if the data was not parsed now (i.e. loaded from the cache).
+    `esigen.batch.process` keeps the summary of the parse done in its workers.
 
     To implement new fields, subclass `ESIgenReport` and modify `ESIgenReport.PARSERS`
     to include the new parsing engine. Also, override `ESIgenReport.parse` with your
@@ -76,35 +106,91 @@ class ESIgenReport(object):
     """
 
     def __init__(self, path, parser=None, datatype=ccDataExtended, missing=None,
-                 loglevel=logging.WARNING, *args, **kwargs):
+                 loglevel=logging.WARNING, cache=None, fields=None, quick=False,
+                 resume=False, sniff_limit=None, profile=False, *args, **kwargs):
         if not os.path.isfile(path):
             raise ValueError('Path "{}" is not available'.format(path))
         self.path = path
         self._missing = missing
-        if parser is None:
-            with open(self.path) as f:
-                guessed = guess_filetype(f)
+        if fields is not None:
+            fields = datatype.fields_for(fields) if hasattr(datatype, 'fields_for') else set(fields)
+        self.fields = fields
+        self.cache = get_cache(cache) if parser is None else None
+        self.parse_profile = None
+        if profile and parser is None:
+            self.parse_profile = ParserProfile()
+            quick = resume = False
+        cached = tail = stream = logfile = None
+        if self.cache is not None and self.parse_profile is None:
+            digest = file_digest(self.path)
+            self._cache_key = self.cache.key(self.path, datatype, fields=fields, digest=digest)
+            cached = self.cache.load(self._cache_key, datatype)
+            if cached is None and fields is not None:
+                # A complete parse has everything a partial one needs
+                cached = self.cache.load(self.cache.key(self.path, datatype, digest=digest),
+                                         datatype)
+        if cached is not None:
+            self.parser = lambda *args, **kwargs: cached
+        elif parser is None:
+            # The lines read to guess the parser are not read again
+            guessed, stream = sniff(self.path, limit=sniff_limit)
             if guessed is None:
                 raise ValueError('File {} is not parsable!'.format(self.path))
-            # in Flask + Py27 str are unicode, which confuses cclib
-            if sys.version_info.major == 2:
-                logfile = open(self.path)
+            parser_kwargs = {} if fields is None else {'fields': fields}
+            # Compressed files can only be read from the beginning
+            compressed = compression(self.path) is not None
+            if quick and not compressed:
+                tail = parse_tail(self.path, guessed, datatype=datatype, loglevel=loglevel,
+                                  **parser_kwargs)
+            if tail is not None:
+                stream.close()
+                self.parser = lambda *args, **kwargs: tail
+            elif resume and not compressed:
+                stream.close()
+                root = None if resume is True else resume
+                resumable = resume_parser(self.path, guessed, datatype=datatype,
+                                          loglevel=loglevel, root=root, **parser_kwargs)
+                logfile = resumable.logfile
+                self.parser = resumable.parse
             else:
-                logfile = self.path
-            self.parser = guessed(logfile, datatype=datatype, loglevel=loglevel)
-            self.parser.datatype = datatype  # workaround
-            self.parser = self.parser.parse
-        self.name = os.path.splitext(os.path.basename(path))[0]
+                logfile = name_logfile(guessed(stream, datatype=datatype, loglevel=loglevel,
+                                               **parser_kwargs), self.path)
+                logfile.datatype = datatype  # workaround
+                if self.parse_profile is not None:
+                    self.parse_profile.attach(logfile)
+                self.parser = logfile.parse
+        else:
+            self.parser = parser
+        self.name = os.path.splitext(os.path.basename(strip_compression(path)))[0]
         self.basename = os.path.basename(path)
-        self.data = self.parse(*args, **kwargs)
-        self.jinja_env = Environment(trim_blocks=True, lstrip_blocks=True,
-                                     loader=PackageLoader('esigen', 'templates'))
-        # Make sure we get a consistent spacing for later replacing
-        self.jinja_env.globals['viewer3d'] = '{{ viewer3d }}'
-        self.jinja_env.globals['missing'] = missing
-        self.jinja_env.globals['convertor'] = convertor
-        self.jinja_env.globals['np'] = np
-        self.jinja_env.globals.update(builtins.__dict__)
+        start = timer()
+        try:
+            self.data = self.parse(*args, **kwargs)
+        finally:
+            if stream is not None:
+                stream.close()
+        if self.parse_profile is not None:
+            self.parse_profile.elapsed = timer() - start
+        errors = getattr(logfile, 'parse_errors', None)
+        self.parse_errors = None if errors is None else errors.summary()
+        # Whether only the last step was parsed
+        self.quick = tail is not None
+        # Parses restricted to some fields are stored under their own key
+        if (self.cache is not None and cached is None and self.parse_profile is None
+                and not self.quick and not resume):
+            self.cache.store(self._cache_key, self.data)
+        if fields is not None:
+            for attr in self.data._attrlist:
+                if attr not in fields and hasattr(self.data, attr):
+                    delattr(self.data, attr)
+
+    @property
+    def jinja_env(self):
+        """
+        Jinja environment used to render the reports. It is shared by all
+        the reports of the process (see `esigen.templating.get_environment`).
+        """
+        return get_environment()
 
     def parse(self, *args, **kwargs):
         """
@@ -120,6 +206,49 @@ class ESIgenReport(object):
         except ValueError as e:
             raise ValueError("File {} could not be parsed. Reason: {}".format(e))
 
+    @classmethod
+    def from_jobs(cls, path, processes=None, datatype=ccDataExtended,
+                  loglevel=logging.WARNING, fields=None, **kwargs):
+        """
+        Report on each of the jobs contained in a multi-step logfile
+        (i.e. Gaussian --Link1--) separately, instead of merging them all
+        in the same dataset. The jobs are located with a quick scan of the
+        file and then parsed in parallel (see `esigen.io.parse_jobs`).
+
+        Parameters
+        ----------
+        path : str
+            Path to the file to be analyzed
+        processes : int, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        datatype, loglevel, fields : see `ESIgenReport`
+        **kwargs : passed to each `ESIgenReport`
+
+        Returns
+        -------
+        reports : list of ESIgenReport
+            One per job, named after the file and the job number (i.e. `name.2`).
+            Files with a single job produce a single report with the usual name.
+        """
+        if not os.path.isfile(path):
+            raise ValueError('Path "{}" is not available'.format(path))
+        guessed = guess_parser(path)
+        if guessed is None:
+            raise ValueError('File {} is not parsable!'.format(path))
+        if fields is not None and hasattr(datatype, 'fields_for'):
+            fields = datatype.fields_for(fields)
+        parser_kwargs = {} if fields is None else {'fields': fields}
+        jobs = parse_jobs(path, guessed, datatype=datatype, processes=processes,
+                          loglevel=loglevel, **parser_kwargs)
+        reports = []
+        for i, data in enumerate(jobs, 1):
+            report = cls(path, parser=lambda *args, **kwargs: data, datatype=datatype,
+                         loglevel=loglevel, fields=fields, **kwargs)
+            if len(jobs) > 1:
+                report.name = '{}.{}'.format(report.name, i)
+            reports.append(report)
+        return reports
+
     # Render methods
     def render_with_pymol(self, **kwargs):
         return render.render_with_pymol(self, **kwargs)
@@ -133,7 +262,7 @@ class ESIgenReport(object):
     def view_with_chemview(self, **kwargs):
         return render.view_with_chemview(self, **kwargs)
 
-    def report(self, template='default.md', process_markdown=False, preview=None):
+    def report(self, template='default.md', process_markdown=False, preview=None, trusted=False):
         """
         Generate a report from a Jinja template.
 
@@ -144,52 +273,81 @@ class ESIgenReport(object):
             a local file or a string. Take in mind that if a non-existant
             file is provided, it will be interpreted as a string!
         process_markdown : bool, optional=False
-            Whether to further re-render a Markdown template as HTML.
+            Whether to further re-render a Markdown template as HTML. The
+            HTML is cached in memory (see `esigen.markup.markdown_to_html`).
         preview : str, optional='static'
             Flag passed to the template engine signaling the style of
             preview to be generated: static, static_server, web or None.
+        trusted : bool, optional=False
+            Render without the Jinja sandbox, which is faster for templates
+            with many loops and calls. Only for templates whose source you
+            trust (builtin ones or your own), never for those received from
+            third parties.
+        """
+        rendered = ''.join(self.generate(template=template, preview=preview, trusted=trusted))
+        if process_markdown:
+            return markdown_to_html(rendered)
+        return rendered
+
+    def generate(self, template='default.md', preview=None, trusted=False):
+        """
+        Render a report piece by piece, so the whole of it does not need to
+        be held in memory. See `report` for the parameters.
+
+        Returns
+        -------
+        chunks : iterator of str
+            Joined together, they are the same as `report(...)`.
         """
         static_preview = preview in ('static', 'static_server')
-        if template in BUILTIN_TEMPLATES:
-            t = self.jinja_env.get_template(template)
-            if static_preview:
-                with open(t.filename) as f:
-                    ast = self.jinja_env.parse(f.read())
-        else:
-            if os.path.isfile(template):
-                with open(template) as f:
-                    template = f.read()
-            # Maybe it is not a file, but a Jinja string
-            t = self.jinja_env.from_string(template)
-            if static_preview:
-                ast = self.jinja_env.parse(template)
+        t = get_template(template, trusted=trusted)
         image = None
-        if self.data.has_coordinates and static_preview and 'image' in find_undeclared_variables(ast):
+        if (self.data.has_coordinates and static_preview
+                and template_info(t.source).image):
             if preview == 'static':
                 image = self.render_with_pymol()
             elif preview == 'static_server':
                 image = os.path.basename(self.render_with_pymol_server())
+        return t.generate(name=self.name, filepath=self.path, filename=os.path.basename(self.path),
+                          image=image, preview=preview, missing=self._missing,
+                          **self.data_as_dict())
+
+    def write_report(self, f, template='default.md', process_markdown=False, preview=None,
+                     trusted=False):
+        """
+        Render a report into the file object `f` as it is generated. See
+        `report` for the rest of parameters.
 
-        rendered = t.render(name=self.name, filepath=self.path, filename=os.path.basename(self.path),
-                            image=image, preview=preview, **self.data_as_dict())
+        Markdown needs the whole document, so with `process_markdown` the
+        report is converted to HTML first and written at once.
+        """
         if process_markdown:
-            return markdown(rendered, extensions=['markdown.extensions.tables',
-                                                  'markdown.extensions.fenced_code',
-                                                  'markdown.extensions.nl2br',
-                                                  'markdown.extensions.sane_lists'])
-        return rendered
+            f.write(self.report(template=template, process_markdown=True, preview=preview,
+                                trusted=trusted))
+            return
+        for chunk in self.generate(template=template, preview=preview, trusted=trusted):
+            f.write(chunk)
 
     def data_as_dict(self):
         """
         Collects all data fields as a dictionary suitable for Jinja rendering.
         Also, redefines None values as `self._missing`.
+
+        The result is built once and reused while `self.data.as_dict()`
+        returns the same object (see `esigen.io.ccDataExtended.as_dict`).
+        A new copy is returned every time, so it can be modified freely.
         """
-        d = {}
-        for k, v in self.data.as_dict().items():
-            if v is None:
-                v = self._missing
-            d[k] = v
-        return d
+        data = self.data.as_dict()
+        cached = getattr(self, '_data_dict', None)
+        if cached is None or cached[0] is not data:
+            d = {}
+            for k, v in data.items():
+                if v is None:
+                    v = self._missing
+                d[k] = v
+            cached = self._data_dict = data, d
+        return cached[1].copy()
 
     def data_as_cjson(self):
+        from cclib.io import CJSONWriter
         return CJSONWriter(self.data, terse=True).generate_repr()
\ No newline at end of file
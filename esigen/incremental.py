@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Resumable parsing of logfiles that are still being written.
+
+`ResumableParser` keeps a cclib parser alive between calls, together with
+the byte offset up to which the logfile has been consumed. Every call to
+`ResumableParser.update` feeds only the newly appended output to the parser,
+so the lists it accumulates (`atomcoords`, `scfenergies`, `maxcartesianforces`,
+the ModRedundant lists...) grow in place instead of being parsed again
+from the beginning.
+
+Only complete steps are consumed. Parsers declare where their steps begin
+and end with two class attributes (see `esigen.io`):
+
+- `RESUME_BEFORE`: keywords of the lines that begin a new step. Output
+  is consumed up to (but not including) the last one of those lines.
+- `RESUME_AFTER`: keywords of the lines that end a step or a job. Output
+  is consumed up to (and including) the last one of those lines.
+
+Parsers without those attributes, and compressed files, are parsed in full
+every time.
+
+The state can be pickled to disk with `ResumableParser.save` and restored
+with `ResumableParser.load`, so separate runs can resume the work of the
+previous ones. By default, states are stored under the `resume` directory of
+the parse cache (see `esigen.cache.default_cache_dir`).
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+import os
+import copy
+import hashlib
+import logging
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+# 3rd party
+import numpy
+from cclib.parser.logfileparser import FileWrapper
+# Own
+from .cache import default_cache_dir
+from .io import ccDataExtended, guess_parser
+from .utils import LogfileStream, MappedLogfile, compression, open_logfile
+
+logger = logging.getLogger(__name__)
+# Attributes of the parser rebuilt by its constructor upon restoring
+_VOLATILE = ('logger', 'loglevel', '_dispatch')
+# Bytes used to tell whether a logfile has been replaced by another one
+_HEADSIZE = 4096
+
+
+def state_path(path, datatype=ccDataExtended, fields=None, root=None):
+    """
+    Location of the saved state of `path`, as parsed with `datatype` and `fields`.
+    States depend on the versions of ESIgen and cclib, too.
+    """
+    from cclib import __version__ as cclib_version
+    from . import __version__ as esigen_version
+    if root is None:
+        root = os.path.join(default_cache_dir(), 'resume')
+    sha1 = hashlib.sha1()
+    for token in (os.path.abspath(path), esigen_version, cclib_version,
+                  datatype.__module__, datatype.__name__, sorted(fields or ())):
+        sha1.update(str(token).encode('utf-8'))
+    return os.path.join(root, sha1.hexdigest() + '.pkl')
+
+
+def _last_boundary(block, before, after):
+    """
+    Position in `block` (bytes) up to which the output can be consumed
+    without leaving any step unfinished. 0 if there is none.
+    """
+    boundary = 0
+    for keyword in before:
+        position = block.rfind(keyword)
+        if position >= 0:
+            boundary = max(boundary, block.rfind(b'\n', 0, position) + 1)
+    for keyword in after:
+        position = block.rfind(keyword)
+        if position >= 0:
+            end = block.find(b'\n', position)
+            if end >= 0:
+                boundary = max(boundary, end + 1)
+    return boundary
+
+
+class ResumableParser(object):
+
+    """
+    Parse a growing logfile step by step.
+
+    Parameters
+    ----------
+    path : str
+        Logfile to parse.
+    parser : cclib.parser.logfileparser.Logfile subclass, optional
+        Parser class. Guessed with `esigen.io.guess_parser` by default.
+    datatype : cclib.parser.ccData or subclass, optional
+    loglevel : int, optional
+    blocksize : int, optional=16MB
+        Size of the blocks read from the logfile.
+    **kwargs : passed to `parser` (i.e. `fields`)
+    """
+
+    def __init__(self, path, parser=None, datatype=ccDataExtended,
+                 loglevel=logging.WARNING, blocksize=1 << 24, **kwargs):
+        if parser is None:
+            parser = guess_parser(path)
+            if parser is None:
+                raise ValueError('File {} is not parsable!'.format(path))
+        self.path = path
+        self.parser = parser
+        self.datatype = datatype
+        self.loglevel = loglevel
+        self.blocksize = blocksize
+        self.kwargs = kwargs
+        self.compressed = compression(path) is not None
+        self.reset()
+
+    def reset(self):
+        """
+        Discard the parsed data and start again from the beginning of the file.
+        """
+        self.logfile = self._new_logfile()
+        # Progress settings, as initialized by cclib's Logfile.parse
+        self.logfile.fupdate, self.logfile.cupdate = 0.05, 0.002
+        self.logfile.before_parsing()
+        self.offset = 0
+        self.head = None
+
+    def _new_logfile(self):
+        logfile = self.parser(self.path, datatype=self.datatype, loglevel=self.loglevel,
+                              **self.kwargs)
+        logfile.datatype = self.datatype  # workaround
+        return logfile
+
+    @property
+    def resumable(self):
+        if self.compressed:
+            return False
+        return hasattr(self.parser, 'RESUME_BEFORE') or hasattr(self.parser, 'RESUME_AFTER')
+
+    def _read_head(self):
+        with open(self.path, 'rb') as f:
+            return hashlib.sha1(f.read(_HEADSIZE)).hexdigest()
+
+    def update(self):
+        """
+        Consume the complete steps appended to the file since the last call.
+        If the file shrinked or was replaced, it is parsed again from scratch.
+
+        Returns
+        -------
+        consumed : int
+            Number of bytes consumed in this call.
+        """
+        size = os.path.getsize(self.path)
+        if self.offset and (size < self.offset or self._read_head() != self.head):
+            logger.info('%s changed since last parsed. Starting over.', self.path)
+            self.reset()
+        if not self.resumable:
+            # No way to tell where a step ends, so parse it all again
+            self.reset()
+            with LogfileStream(open_logfile(self.path), self.path) as f:
+                self._feed(f)
+            self.offset = size
+            self.head = self._read_head()
+            return size
+        before = tuple(k.encode('utf-8') for k in getattr(self.parser, 'RESUME_BEFORE', ()))
+        after = tuple(k.encode('utf-8') for k in getattr(self.parser, 'RESUME_AFTER', ()))
+        start = self.offset
+        blocksize = self.blocksize
+        with open(self.path, 'rb') as f:
+            while self.offset < size:
+                f.seek(self.offset)
+                block = f.read(blocksize)
+                boundary = _last_boundary(block, before, after)
+                if not boundary:
+                    if self.offset + len(block) >= size:
+                        break  # the current step is not complete yet
+                    blocksize *= 2
+                    continue
+                with MappedLogfile(self.path, self.offset, self.offset + boundary) as stream:
+                    self._feed(stream)
+                self.offset += boundary
+        if self.head is None and self.offset:
+            self.head = self._read_head()
+        return self.offset - start
+
+    def _feed(self, stream):
+        inputfile = FileWrapper(stream)
+        # Same loop as in cclib's Logfile.parse
+        for line in inputfile:
+            try:
+                self.logfile.extract(inputfile, line)
+            except StopIteration:
+                self.logfile.logger.error('Unexpectedly encountered end of logfile.')
+                break
+
+    def parse(self, *args, **kwargs):
+        """
+        Build a `datatype` instance with the data parsed so far. The state of
+        the parser is not modified, so more output can be consumed later.
+        """
+        logfile = copy.copy(self.logfile)
+        # after_parsing may replace or extend the attributes, but we want them intact
+        for name, value in logfile.__dict__.items():
+            if isinstance(value, (list, dict)):
+                setattr(logfile, name, copy.copy(value))
+        logfile.after_parsing()
+        # Same as in cclib's Logfile.parse
+        if not hasattr(logfile, "atomcoords") and hasattr(logfile, "inputcoords"):
+            logfile.atomcoords = numpy.array(logfile.inputcoords, 'd')
+        if not hasattr(logfile, "nmo") and hasattr(logfile, "nbasis"):
+            logfile.nmo = logfile.nbasis
+        if not hasattr(logfile, "coreelectrons") and hasattr(logfile, "natom"):
+            logfile.coreelectrons = numpy.zeros(logfile.natom, "i")
+        if hasattr(logfile, "incorrect_coreelectrons"):
+            del logfile.coreelectrons
+        data = self.datatype(attributes=logfile.__dict__)
+        data.arrayify()
+        data.check_values(logger=logfile.logger)
+        return data
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['logfile'] = dict((k, v) for (k, v) in self.logfile.__dict__.items()
+                                if k not in _VOLATILE)
+        return state
+
+    def __setstate__(self, state):
+        logfile = state.pop('logfile')
+        self.__dict__.update(state)
+        self.logfile = self._new_logfile()
+        self.logfile.__dict__.update(logfile)
+
+    def save(self, path):
+        """
+        Pickle the state to `path`. The file is written atomically.
+        """
+        directory = os.path.dirname(path)
+        tmp = '{}.tmp-{}'.format(path, os.getpid())
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(tmp, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, path)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            logger.warning('Could not save parser state to %s: %s', path, e)
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+
+    @classmethod
+    def load(cls, path, loglevel=logging.WARNING):
+        """
+        Restore a state previously saved with `save`.
+
+        Returns
+        -------
+        parser : ResumableParser or None
+            None if `path` is not available or could not be read.
+        """
+        try:
+            with open(path, 'rb') as f:
+                resumable = pickle.load(f)
+        except (IOError, OSError, EOFError, AttributeError, ImportError,
+                pickle.UnpicklingError) as e:
+            if os.path.isfile(path):
+                logger.warning('Ignoring unreadable parser state %s: %s', path, e)
+            return None
+        resumable.loglevel = loglevel
+        resumable.logfile.logger.setLevel(loglevel)
+        return resumable
+
+
+def resume(path, parser=None, datatype=ccDataExtended, loglevel=logging.WARNING,
+           root=None, **kwargs):
+    """
+    Restore the saved state of `path` (or start a new one), consume the
+    output appended since then and save the state again.
+
+    Parameters
+    ----------
+    path : str
+        Logfile to parse.
+    root : str, optional
+        Directory where the states are saved. Defaults to the `resume`
+        directory of the parse cache.
+    parser, datatype, loglevel, **kwargs : see `ResumableParser`
+
+    Returns
+    -------
+    resumable : ResumableParser
+        Call its `parse` method to obtain the data.
+    """
+    state = state_path(path, datatype=datatype, fields=kwargs.get('fields'), root=root)
+    resumable = ResumableParser.load(state, loglevel=loglevel)
+    if resumable is None or (parser is not None and resumable.parser is not parser):
+        resumable = ResumableParser(path, parser=parser, datatype=datatype,
+                                    loglevel=loglevel, **kwargs)
+    if resumable.update() or not os.path.isfile(state):
+        resumable.save(state)
+    return resumable
@@ -9,25 +9,139 @@ functionality of ESIgen to new formats.
 Two subclasses are implemented here: `ccDataExtended` (based on
 cclib.parser.data.ccData_optdone_bool) and `GaussianParser` (based on
 cclib.parser.Gaussian). `ccDataExtended` is chosen as the default
-`datatype` in all the calls to the cclib parsers. To replace
-the default Gaussian parser in cclib, the list `cclib.io.ccio.triggers`
-is patched upon import of this module (see end of file).
+`datatype` in all the calls to the cclib parsers. `GaussianParser` and
+`ChemShell` are chosen over the cclib parsers through the parser registry
+(see `esigen.registry`), which is also used by `sniff` to guess the
+parser of a logfile.
 """
 
 # Stdlib
 from __future__ import division, print_function, absolute_import
+import io
 import os
+import mmap
 import logging
 import re
-from collections import defaultdict
+from multiprocessing import Pool, cpu_count
 import numpy as np
 from cclib.io import CML
-from cclib.io.ccio import triggers as ccio_triggers
+from cclib.io import cmlwriter as _cmlwriter
 from cclib.parser import Gaussian as _cclib_Gaussian
 from cclib.parser.logfileparser import Logfile
 from cclib.parser.data import ccData_optdone_bool, Attribute
 from cclib.parser.utils import convertor
-from .utils import PERIODIC_TABLE
+from . import registry, writers
+from .utils import (ELEMENTS, LogfileStream, MappedLogfile, compression, open_logfile,
+                    stoichiometry)
+
+# cclib only writes CML bonds if Open Babel is available
+_CML_BONDS = getattr(_cmlwriter, '_has_openbabel', True)
+
+
+class derived_property(object):
+
+    """
+    Read-only property of `ccDataExtended` that is computed only once. The
+    value is kept until one of the attributes it depends on (as listed in
+    `_dependencies`) is set or deleted. Values of properties without listed
+    dependencies are discarded whenever any attribute changes.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        cache = obj.__dict__.setdefault('_derived', {})
+        try:
+            return cache[self.__name__]
+        except KeyError:
+            value = cache[self.__name__] = self.func(obj)
+            return value
+
+
+class EnergyTable(object):
+
+    """
+    Energy decompositions of every step (i.e. ChemShell's MM energy terms),
+    stored as columns that share a single index of terms.
+
+    Parameters
+    ----------
+    rows : list of dict, optional
+        One {term: energy} dict per step.
+
+    Attributes
+    ----------
+    keys : tuple of str
+        Names of the terms, in order of appearance.
+    values : (nsteps, nterms) array of float
+        Energy of each term in each step. NaN if not printed in that step.
+
+    Notes
+    -----
+    It behaves like the list of dicts it replaces, so templates can keep
+    using `table[-1].items()`. The dict of each step is built on demand and
+    reused afterwards. Use `column` to obtain the values of a term.
+    """
+
+    def __init__(self, rows=()):
+        keys = {}
+        for row in rows:
+            for key in row:
+                keys.setdefault(key, len(keys))
+        values = np.full((len(rows), len(keys)), np.nan)
+        for i, row in enumerate(rows):
+            for key, value in row.items():
+                values[i, keys[key]] = value
+        self.keys = tuple(sorted(keys, key=keys.get))
+        self.values = values
+        self._rows = {}
+
+    @classmethod
+    def from_columns(cls, keys, values):
+        table = cls()
+        table.keys = tuple(keys)
+        table.values = np.asarray(values, dtype=float).reshape(-1, len(table.keys))
+        return table
+
+    def column(self, key):
+        return self.values[:, self.keys.index(key)]
+
+    def tolist(self):
+        return [self[i] for i in range(len(self))]
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('EnergyTable index out of range')
+        row = self._rows.get(index)
+        if row is None:
+            row = self._rows[index] = dict(
+                (key, value) for (key, value) in zip(self.keys, self.values[index].tolist())
+                if value == value)  # skip NaN
+        return row
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_rows'] = {}
+        return state
+
+    def __repr__(self):
+        return 'EnergyTable({} steps x {} terms)'.format(len(self), len(self.keys))
 
 
 class ccDataExtended(ccData_optdone_bool):
@@ -51,7 +165,14 @@ class ccDataExtended(ccData_optdone_bool):
     `atomcoords`) or compute values out of them (see `mean_of_electrons`).
 
     A new list, _properties, is necessary to collect the defined properties,
-    separate from _attrlist to circumvent errors in .arrayify().
+    separate from _attrlist to circumvent errors in .arrayify(). The attributes
+    each property is computed from are listed in _dependencies, so only those
+    need to be parsed when a template requests the property (see `fields_for`).
+
+    Expensive properties are decorated with `derived_property` instead, so they
+    are computed once and recomputed only if their dependencies change. The
+    same applies to the dict returned by `as_dict`, which must not be modified.
+    Changes made in place (i.e. to the items of an array) are not detected.
     """
 
     _attributes = ccData_optdone_bool._attributes.copy()
@@ -65,23 +186,81 @@ class ccDataExtended(ccData_optdone_bool):
          'modredvars':          Attribute(list,  'ModRedundant variables',           'N/A'),
          'modreddefs':          Attribute(list,  'ModRedundant definitions',         'N/A'),
          'modredenergies':      Attribute(list,  'ModRedundant energies',            'N/A'),
-         'modredvalues':        Attribute(list,  'ModRedundant values (dist, angle)','N/A'),
-         'maxcartesianforces':  Attribute(list,  'Max cartesian forces',             'N/A'),
+         'modredvalues':        Attribute(np.ndarray, 'ModRedundant values (dist, angle)', 'N/A'),
+         'maxcartesianforces':  Attribute(np.ndarray, 'Max cartesian forces',        'N/A'),
          # ChemShell only
-         'mmenergies':          Attribute(list,  'MM energy decomposition',          'N/A'),
-         'energycontributions': Attribute(list,  'QM/MM energy decomposition',       'N/A'),
+         'mmenergies':          Attribute(EnergyTable, 'MM energy decomposition',    'N/A'),
+         'energycontributions': Attribute(EnergyTable, 'QM/MM energy decomposition', 'N/A'),
          })
     _attrlist = sorted(_attributes.keys())
     _properties = ['mean_of_electrons', 'atoms', 'coordinates', 'electronic_energy',
                    'imaginary_freqs', 'cartesians', 'nsteps', 'stoichiometry']
+    _dependencies = {
+        'mean_of_electrons': ('alphaelectrons', 'betaelectrons'),
+        'atoms': ('atomnos',),
+        'coordinates': ('atomcoords',),
+        'electronic_energy': ('scfenergies',),
+        'imaginary_freqs': ('vibfreqs',),
+        'cartesians': ('atomnos', 'atomcoords'),
+        'nsteps': ('scfenergies',),
+        'stoichiometry': ('atomnos', 'charge'),
+        'has_coordinates': ('natom', 'atomnos', 'atomcoords'),
+        'xyz_block': ('atomnos', 'atomcoords'),
+        'pdb_block': ('atomnos', 'atomcoords'),
+        'cml_block': ('natom', 'atomnos', 'atomcoords', 'charge', 'mult'),
+    }
+
+    def __setattr__(self, name, value):
+        super(ccDataExtended, self).__setattr__(name, value)
+        self._invalidate(name)
+
+    def __delattr__(self, name):
+        super(ccDataExtended, self).__delattr__(name)
+        self._invalidate(name)
+
+    def __getstate__(self):
+        # Derived values are cheaper to recompute than to pickle
+        state = self.__dict__.copy()
+        state.pop('_derived', None)
+        return state
+
+    def _invalidate(self, name):
+        """
+        Discard the derived values that depend on attribute `name`.
+        """
+        cache = self.__dict__.get('_derived')
+        if cache:
+            for key in list(cache):
+                dependencies = self._dependencies.get(key)
+                if dependencies is None or name in dependencies:
+                    del cache[key]
 
     def as_dict(self):
         """
         Collects all defined attributes in _attrlist and _properties, using None
-        if not present.
+        if not present. The dict is reused until any attribute changes.
+        """
+        cache = self.__dict__.setdefault('_derived', {})
+        if 'as_dict' not in cache:
+            cache['as_dict'] = {attr: getattr(self, attr, None)
+                                for attr in self._attrlist + self._properties}
+        return cache['as_dict']
+
+    @classmethod
+    def fields_for(cls, names):
+        """
+        Expand a collection of attribute and property names to the set of
+        names that must be parsed to compute all of them. Unknown names
+        (template variables like `name` or `image`) are ignored.
         """
-        return {attr: getattr(self, attr, None)
-                for attr in self._attrlist + self._properties}
+        fields = set()
+        for name in names:
+            if name in cls._attributes:
+                fields.add(name)
+            elif name in cls._dependencies:
+                fields.add(name)
+                fields.update(cls._dependencies[name])
+        return fields
 
     # Use properties to add aliases or methods on raw data
     # Do not forget to update the _properties class attribute
@@ -93,9 +272,9 @@ class ccDataExtended(ccData_optdone_bool):
                 return int(mean)
             return round(mean, 1)
 
-    @property
+    @derived_property
     def atoms(self):
-        return np.array([PERIODIC_TABLE.element[n] for n in self.atomnos])
+        return ELEMENTS[np.asarray(self.atomnos, dtype=int)]
 
     @property
     def coordinates(self):
@@ -116,163 +295,425 @@ class ccDataExtended(ccData_optdone_bool):
         if hasattr(self, 'scfenergies'):
             return self.scfenergies.shape[0]
 
-    @property
+    @derived_property
     def stoichiometry(self):
-        from cclib.method import Nuclear
-        return Nuclear(self).stoichiometry()
+        return stoichiometry(self.atomnos, getattr(self, 'charge', 0))
 
     @property
     def has_coordinates(self):
         return hasattr(self, 'atomnos') and hasattr(self, 'atomcoords')
 
-    @property
+    @derived_property
     def xyz_block(self):
-        return '\n'.join(['{:4} {: 15.6f} {: 15.6f} {: 15.6f}'.format(a, *xyz)
-                          for (a, xyz) in zip(self.atoms, self.coordinates)])
+        return writers.xyz(self.atoms, self.coordinates)
     cartesians = xyz_block
 
     def xyz_from(self, n):
         try:
-            return '\n'.join(['{:4} {: 15.6f} {: 15.6f} {: 15.6f}'.format(a, *xyz)
-                              for (a, xyz) in zip(self.atoms, self.atomcoords[n])])
+            return writers.xyz(self.atoms, self.atomcoords[n])
         except IndexError:
             raise ValueError('N must be smaller than {}'.format(self.atomcoords.shape[0]))
 
     @property
+    def converged_frames(self):
+        """
+        Indices of the frames in `atomcoords` where the optimization
+        converged (i.e. the final structure, or each point of a relaxed scan).
+        """
+        status = np.asarray(getattr(self, 'optstatus', ()), dtype=int)
+        return np.flatnonzero(status[:len(self.atomcoords)] & self.OPT_DONE)
+
+    def xyz_trajectory(self, indices=None, label='Step'):
+        """
+        Multi-frame XYZ of the frames in `atomcoords` at `indices` (all of them
+        by default), titled after `label` and the step number (indexed at 1).
+        Yields the text in chunks (see `esigen.writers.iter_xyz_frames`).
+        """
+        if indices is None:
+            indices = np.arange(len(self.atomcoords))
+        indices = np.asarray(indices, dtype=int)
+        titles = ['{} {}'.format(label, i + 1) for i in indices.tolist()]
+        return writers.iter_xyz_frames(self.atoms, self.atomcoords[indices], titles=titles)
+
+    @derived_property
     def pdb_block(self):
-        s = ('{field:<6}{serial_number:>5d} '
-             '{atom_name:^4}{alt_loc_indicator:<1}{res_name:<3} '
-             '{chain_id:<1}{res_seq_number:>4d}{insert_code:<1}   '
-             '{x_coord: >8.3f}{y_coord: >8.3f}{z_coord: >8.3f}'
-             '{occupancy:>6.2f}{temp_factor:>6.2f}          '
-             '{element:>2}{charge:>2}')
-        default = {'alt_loc_indicator': '', 'res_name': 'UNK', 'chain_id': '',
-                   'res_seq_number': 1, 'insert_code': '', 'occupancy': 1.0,
-                   'temp_factor': 0.0, 'charge': ''}
-        pdb = ['TITLE unknown', 'MODEL 1']
-        counter = defaultdict(int)
-        for i, (element, (x, y, z)) in enumerate(zip(self.atoms, self.coordinates)):
-            field = 'ATOM' if element.upper() in 'CHONPS' else 'HETATM'
-            counter[element] += 1
-            pdb.append(s.format(field=field, serial_number=i + 1, element=element,
-                                atom_name='{}{}'.format(element, counter[element]),
-                                x_coord=x, y_coord=y, z_coord=z, **default))
-        pdb.append('ENDMDL\nEND\n')
-        return '\n'.join(pdb)
+        return writers.pdb(self.atoms, self.coordinates)
 
-    @property
+    @derived_property
     def cml_block(self):
-        return CML(self).generate_repr()
+        if _CML_BONDS:
+            return CML(self).generate_repr()
+        if not self.has_coordinates:
+            return writers.cml((), ())
+        return writers.cml(self.atoms, self.coordinates)
+
+
+def _drop_unrequested(obj, fields):
+    """
+    Delete the ccDataExtended attributes of `obj` not listed in `fields`.
+    Called before cclib arrayifies the parsed values, to save time and memory.
+    """
+    for attr in ccDataExtended._attrlist:
+        if attr not in fields and attr in obj.__dict__:
+            delattr(obj, attr)
+
+
+def name_logfile(logfile, name):
+    """
+    Make `logfile`, built from a stream, log as if it had been built from
+    the path `name`. Otherwise, cclib names its logger after the type of
+    the stream (i.e. "Gaussian stream <class ...>").
+    """
+    logfile.filename = name
+    logger = logging.getLogger('%s %s' % (logfile.logname, name))
+    logger.setLevel(logfile.logger.level)
+    if not logger.handlers:
+        for handler in logfile.logger.handlers:
+            logger.addHandler(handler)
+    logfile.logger = logger
+    parse_errors = getattr(logfile, 'parse_errors', None)
+    if parse_errors is not None:
+        parse_errors.logger = logger
+    return logfile
+
+
+class ParseErrors(object):
+
+    """
+    Errors raised while parsing, aggregated by handler and exception type.
+
+    Only the first `samples` errors of each kind are logged and kept as
+    examples. The rest are just counted, and reported with a single record
+    by `log_summary`, so a malformed section cannot flood the logs.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    samples : int, optional=3
+        Errors logged and kept of each kind.
+    """
+
+    def __init__(self, logger, samples=3):
+        self.logger = logger
+        self.samples = samples
+        # {(handler, exception type): [count, [(message, line), ...]]}
+        self.errors = {}
+
+    def add(self, handler, exception, line):
+        """
+        Record that `handler` (a name) raised `exception` while parsing `line`.
+        """
+        key = handler, type(exception).__name__
+        entry = self.errors.get(key)
+        if entry is None:
+            entry = self.errors[key] = [0, []]
+        entry[0] += 1
+        if entry[0] <= self.samples:
+            sample = str(exception), line.rstrip()
+            entry[1].append(sample)
+            self.logger.error('Line could not be parsed by %s (%s: %s), but job will continue. '
+                              'Errors may arise. Line: %s', handler, key[1], *sample)
+
+    def __len__(self):
+        return sum(count for (count, _) in self.errors.values())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['logger'] = self.logger.name
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(state['logger'])
+
+    def log_summary(self):
+        """
+        Log the number of errors of each kind that were not logged.
+        """
+        for (handler, exception), (count, _) in sorted(self.errors.items()):
+            if count > self.samples:
+                self.logger.error('%d more %s errors in %s were not logged',
+                                  count - self.samples, exception, handler)
+
+    def summary(self):
+        """
+        Errors of each kind, most frequent first.
+
+        Returns
+        -------
+        summary : list of dict
+            With keys `handler`, `exception`, `count` and `samples`
+            (a list of (message, line) tuples).
+        """
+        summary = [dict(handler=handler, exception=exception, count=count, samples=list(samples))
+                   for (handler, exception), (count, samples) in self.errors.items()]
+        return sorted(summary, key=lambda e: (-e['count'], e['handler'], e['exception']))
+
+
+# Atoms of a ModRedundant variable, i.e. 'R(74,81)'
+_MODRED_ATOMS = re.compile(r'[A-Z]\(([\d,]+)\)')
 
 
 class GaussianParser(_cclib_Gaussian):
 
     """
     Subclass while we wait for cclib 1.5.3
+
+    Extra fields are extracted by the handlers listed in `EXTRACTORS`. To
+    avoid testing every handler against every line, they are indexed by
+    the second character of the lines that can trigger them (Gaussian
+    indents its output by one space), and only those candidates whose
+    keyword is found in the line are called. Every line is then passed
+    to the cclib parser, except blank ones (none of its handlers looks
+    for them).
+
+    Exceptions raised by the handlers do not stop the parse. They are
+    collected in `parse_errors` (see `ParseErrors`), and only a few of
+    each kind are logged.
+
+    ModRedundant scans are collected as rows of values (one per step and
+    scan point), with a column per scanned variable. Their arrays are built
+    in `after_parsing`.
     """
 
+    # (line[1:2] candidates, keyword, handler name, fields), in evaluation order.
+    # Handlers return the last line they read, which is passed to the
+    # next candidates and, finally, to cclib. Handlers are only enabled
+    # if any of their fields was requested (see `fields` below).
+    _MODRED = ('modredvars', 'modreddefs', 'modredenergies', 'modredvalues')
+    EXTRACTORS = (
+        ('S', 'Stoichiometry', '_extract_stoichiometry', ('stoichiometry',)),
+        ('S', 'Sum of electronic and zero-point Energies=', '_extract_zeropointenergy',
+         ('zeropointenergy',)),
+        ('S', 'Sum of electronic and thermal Energies', '_extract_thermalenergy',
+         ('thermalenergy',)),
+        (' 0123456789', 'alpha electrons', '_extract_electrons',
+         ('alphaelectrons', 'betaelectrons')),
+        ('#', '#', '_extract_route', ('metadata',)),
+        ('!', 'Scan', '_extract_modredundant', _MODRED),
+        ('V', 'Variable', '_extract_modredenergies', _MODRED),
+        (' !', 'Optimized Parameters', '_extract_modredvalues', _MODRED),
+        ('C', 'Cartesian Forces:  Max', '_extract_maxcartesianforces', ('maxcartesianforces',)),
+        ('S', 'Solvent              :', '_extract_solvent', ('solvent',)),
+    )
+
+    # Quick mode (see `parse_tail`): the last step of the job begins with
+    # the orientation block printed before the last SCF energy.
+    TAIL_ENERGY = ' SCF Done:'
+    TAIL_ANCHORS = ('Input orientation:', 'Standard orientation:', 'Z-Matrix orientation:')
+    TAIL_REQUIRED = ('scfenergies', 'atomcoords')
+    # If the last step lacks `optdone` but the previous job optimized the
+    # geometry (i.e. opt+freq with --Link1--), the whole file is parsed
+    TAIL_OPTIMIZATION = (' Optimization completed', ' Optimization stopped')
+    # Incremental parsing (see `esigen.incremental`): steps begin with an
+    # orientation block and jobs end with the termination message.
+    RESUME_BEFORE = TAIL_ANCHORS
+    RESUME_AFTER = ('Normal termination of Gaussian', 'Error termination')
+    # Multi-step files (--Link1--) are split before the lines that start a job,
+    # if the previous one has ended (see `split_jobs`). A failed job prints
+    # several termination lines, so these are not split after.
+    JOB_STARTS = (' Link1:  Proceeding to internal job step', ' Entering Gaussian System',
+                  ' Entering Link 1 = ')
+    JOB_ENDS = RESUME_AFTER
+
     def __init__(self, *args, **kwargs):
+        # Collection of attribute names to extract. None means all of them.
+        fields = kwargs.pop('fields', None)
         # Call the __init__ method of the superclass
         super(GaussianParser, self).__init__(*args, **kwargs)
         self.datatype = ccDataExtended  # workaround
+        self.fields = None if fields is None else frozenset(fields)
+        self.parse_errors = ParseErrors(self.logger)
+        self._dispatch = {}
+        for prefixes, keyword, name, produced in self.EXTRACTORS:
+            if self.fields is not None and self.fields.isdisjoint(produced):
+                continue
+            handler = getattr(self, name)
+            for char in prefixes:
+                self._dispatch.setdefault(char, []).append((keyword, handler))
 
     # Reimplement .extract() in your own subclasses to add more fields.
     def extract(self, inputfile, line):
+        handler = None
         try:
-            if "Stoichiometry" in line:
-                self.set_attribute('stoichiometry', line.split()[-1])
-            if "Sum of electronic and zero-point Energies=" in line:
-                self.set_attribute('zeropointenergy', float(line.split()[6]))
-            if "Sum of electronic and thermal Energies" in line:
-                self.set_attribute('thermalenergy', float(line.split()[6]))
-            if "alpha electrons" in line:
-                fields = line.split()
-                alpha_index = fields.index('alpha')
-                beta_index = fields.index('beta')
-                self.set_attribute('alphaelectrons', int(fields[alpha_index-1]))
-                self.set_attribute('betaelectrons', int(fields[beta_index-1]))
-            if line.strip().startswith('#') and not hasattr(self, 'route'):
-                route_lines = line.strip().split('#', 1)[1:2]
-                line = inputfile.next()
-                while '-----' not in line:
-                    route_lines.append(line[1:].rstrip())
-                    line = inputfile.next()
-                self.metadata['route'] = ''.join(route_lines).strip()
-            # ! R80   R(61,67)                1.0949         estimate D2E/DX2                !
-            # ! R81   R(74,75)                1.654          estimate D2E/DX2                !
-            # ! R82   R(74,78)                1.4917         estimate D2E/DX2                !
-            # ! R83   R(74,81)                2.3155         Scan                            !
-            # ! R84   R(75,76)                1.4818         estimate D2E/DX2                !
-            # ! R85   R(75,77)                1.4786         estimate D2E/DX2                !
-            # ! R86   R(75,97)                1.7995         estimate D2E/DX2                !
-            # ! R87   R(78,79)                1.0895         estimate D2E/DX2                !
-            if line[:2] == ' !' and "Scan" in line:  # reaction coordinate being assessed
-                if not hasattr(self, 'modredvars'):
-                    self.modredvars = []
-                    self.modreddefs = []
-                    self.modredvalues = []
-                    self.modredenergies = [[]]
-                fields = line.split()
-                self.modredvars.append(fields[1])
-                atoms = [int(a) - 1 for a in
-                         re.search('[A-Z]\(([\d,]+)\)', fields[2]).groups()[0].split(',')]
-                self.modreddefs.append(atoms)
-            # ITry= 1 IFail=0 DXMaxC= 8.52D-01 DCOld= 1.00D+10 DXMaxT= 7.50D-02 DXLimC= 3.00D+00 Rises=T
-            # Variable       Old X    -DE/DX   Delta X   Delta X   Delta X     New X
-            #                                 (Linear)    (Quad)   (Total)
-            #     R1        4.58797  -0.00150  -0.00627   0.00000  -0.00627   4.58170
-            #     R2        3.54601   0.00198  -0.00219   0.00000  -0.00219   3.54382
-            #     R3        3.56544   0.00283   0.00199   0.00000   0.00199   3.56743
-            #     R4        3.54630   0.00358   0.00057   0.00000   0.00057   3.54688
-            #     R5        4.05549  -0.00236   0.00239   0.00000   0.00243   4.05792
-            #     R6        4.11072  -0.00118  -0.00158   0.00000  -0.00155   4.10916
-            #     R7        4.23620  -0.00085  -0.00445   0.00000  -0.00442   4.23178
-            #     R8        4.29838  -0.00111  -0.00076   0.00000  -0.00072   4.29766
-            #     R9        4.34017   0.00165  -0.03341   0.00000  -0.03341   4.30675
-            #    R10        2.92230   0.00033  -0.00108   0.00000  -0.00108   2.92122
-            if hasattr(self, 'modredenergies'):
-                if line[1:9] == 'Variable':
-                    self.modredenergies[-1].append([])
-                    next(inputfile)
-                    line = next(inputfile)
-                    while 'Converged?' not in line:
-                        fields = line.split()
-                        if fields[0] in self.modredvars:
-                            self.modredenergies[-1][-1].append(float(fields[2]))
-                        line = next(inputfile)
-                if  'Optimized Parameters' in line:
-                    self.modredenergies.append([])
-                    self.modredvalues.append([])
-                    for i in range(5):
-                        line = next(inputfile)
-                    while line[1:5] != '----':
-                        fields = line.split()
-                        if fields[1] in self.modredvars:
-                            self.modredvalues[-1].append(float(fields[3]))
-                        line = next(inputfile)
-            if line[1:23] == 'Cartesian Forces:  Max':
-                if not hasattr(self, 'maxcartesianforces'):
-                    self.maxcartesianforces = []
-                self.maxcartesianforces.append(float(line.split()[3]))
-
-            # Retrieve solvent in use
-            if line[1:23] == 'Solvent              :':
-                solvent = line.split()[2].rstrip(',')
-                self.set_attribute('solvent', solvent)
-            super(GaussianParser, self).extract(inputfile, line)
+            for keyword, handler in self._dispatch.get(line[1:2], ()):
+                if keyword in line:
+                    line = handler(inputfile, line)
+            handler = None
+            # Blank lines cannot trigger any of the cclib handlers
+            if line and not line.isspace():
+                super(GaussianParser, self).extract(inputfile, line)
         except Exception as e:
-            self.logger.error('Line could not be parsed! '
-                              'Job will continue, but errors may arise')
-            self.logger.error('  Exception: %s', e)
-            self.logger.error('  Line: %s', line)
+            name = 'cclib' if handler is None else handler.__name__
+            self.parse_errors.add(name, e, line)
+
+    def after_parsing(self):
+        self.parse_errors.log_summary()
+        super(GaussianParser, self).after_parsing()
+        if hasattr(self, '_modred_columns'):
+            self._build_modredundant()
+        if self.fields is not None:
+            _drop_unrequested(self, self.fields)
+
+    def _build_modredundant(self):
+        """
+        Arrange the collected -dE/dX values as a list with the (steps, variables)
+        array of each scan point, and the optimized values as a (points, variables)
+        array. The rows are not modified, so more steps can be appended later
+        (see `esigen.incremental`).
+        """
+        nvars = len(self._modred_columns)
+        steps = np.array(self._modred_steps, dtype=float).reshape(-1, nvars)
+        bounds = self._modred_points + [len(steps)]
+        self.modredenergies = [steps[start:end] for (start, end) in zip(bounds[:-1], bounds[1:])]
+        self.modredvalues = np.array(self._modred_values, dtype=float).reshape(-1, nvars)
+
+    def _extract_stoichiometry(self, inputfile, line):
+        self.set_attribute('stoichiometry', line.split()[-1])
+        return line
+
+    def _extract_zeropointenergy(self, inputfile, line):
+        self.set_attribute('zeropointenergy', float(line.split()[6]))
+        return line
+
+    def _extract_thermalenergy(self, inputfile, line):
+        self.set_attribute('thermalenergy', float(line.split()[6]))
+        return line
+
+    def _extract_electrons(self, inputfile, line):
+        fields = line.split()
+        alpha_index = fields.index('alpha')
+        beta_index = fields.index('beta')
+        self.set_attribute('alphaelectrons', int(fields[alpha_index-1]))
+        self.set_attribute('betaelectrons', int(fields[beta_index-1]))
+        return line
+
+    def _extract_route(self, inputfile, line):
+        if line.strip().startswith('#') and not hasattr(self, 'route'):
+            route_lines = line.strip().split('#', 1)[1:2]
+            line = inputfile.next()
+            while '-----' not in line:
+                route_lines.append(line[1:].rstrip())
+                line = inputfile.next()
+            self.metadata['route'] = ''.join(route_lines).strip()
+        return line
+
+    # ! R80   R(61,67)                1.0949         estimate D2E/DX2                !
+    # ! R81   R(74,75)                1.654          estimate D2E/DX2                !
+    # ! R82   R(74,78)                1.4917         estimate D2E/DX2                !
+    # ! R83   R(74,81)                2.3155         Scan                            !
+    # ! R84   R(75,76)                1.4818         estimate D2E/DX2                !
+    # ! R85   R(75,77)                1.4786         estimate D2E/DX2                !
+    # ! R86   R(75,97)                1.7995         estimate D2E/DX2                !
+    # ! R87   R(78,79)                1.0895         estimate D2E/DX2                !
+    def _extract_modredundant(self, inputfile, line):
+        if line[:2] == ' !':  # reaction coordinate being assessed
+            if not hasattr(self, 'modredvars'):
+                self.modredvars = []
+                self.modreddefs = []
+                # Column of each variable in the rows of values
+                self._modred_columns = {}
+                # -dE/dX rows of all the steps, and the first step of each scan point
+                self._modred_steps = []
+                self._modred_points = [0]
+                self._modred_values = []
+            fields = line.split()
+            self.modredvars.append(fields[1])
+            self._modred_columns.setdefault(fields[1], len(self._modred_columns))
+            atoms = [int(a) - 1 for a in _MODRED_ATOMS.search(fields[2]).group(1).split(',')]
+            self.modreddefs.append(atoms)
+        return line
+
+    # ITry= 1 IFail=0 DXMaxC= 8.52D-01 DCOld= 1.00D+10 DXMaxT= 7.50D-02 DXLimC= 3.00D+00 Rises=T
+    # Variable       Old X    -DE/DX   Delta X   Delta X   Delta X     New X
+    #                                 (Linear)    (Quad)   (Total)
+    #     R1        4.58797  -0.00150  -0.00627   0.00000  -0.00627   4.58170
+    #     R2        3.54601   0.00198  -0.00219   0.00000  -0.00219   3.54382
+    #     R3        3.56544   0.00283   0.00199   0.00000   0.00199   3.56743
+    #     R4        3.54630   0.00358   0.00057   0.00000   0.00057   3.54688
+    #     R5        4.05549  -0.00236   0.00239   0.00000   0.00243   4.05792
+    #     R6        4.11072  -0.00118  -0.00158   0.00000  -0.00155   4.10916
+    #     R7        4.23620  -0.00085  -0.00445   0.00000  -0.00442   4.23178
+    #     R8        4.29838  -0.00111  -0.00076   0.00000  -0.00072   4.29766
+    #     R9        4.34017   0.00165  -0.03341   0.00000  -0.03341   4.30675
+    #    R10        2.92230   0.00033  -0.00108   0.00000  -0.00108   2.92122
+    def _extract_modredenergies(self, inputfile, line):
+        if hasattr(self, '_modred_columns') and line[1:9] == 'Variable':
+            columns = self._modred_columns
+            row = [np.nan] * len(columns)
+            next(inputfile)
+            line = next(inputfile)
+            while 'Converged?' not in line:
+                fields = line.split(None, 3)
+                column = columns.get(fields[0])
+                if column is not None:
+                    row[column] = float(fields[2])
+                line = next(inputfile)
+            self._modred_steps.append(row)
+        return line
+
+    def _extract_modredvalues(self, inputfile, line):
+        if hasattr(self, '_modred_columns'):
+            columns = self._modred_columns
+            row = [np.nan] * len(columns)
+            self._modred_points.append(len(self._modred_steps))
+            for i in range(5):
+                line = next(inputfile)
+            while line[1:5] != '----':
+                fields = line.split(None, 4)
+                column = columns.get(fields[1])
+                if column is not None:
+                    row[column] = float(fields[3])
+                line = next(inputfile)
+            self._modred_values.append(row)
+        return line
+
+    def _extract_maxcartesianforces(self, inputfile, line):
+        if line[1:23] == 'Cartesian Forces:  Max':
+            if not hasattr(self, 'maxcartesianforces'):
+                self.maxcartesianforces = []
+            self.maxcartesianforces.append(float(line.split()[3]))
+        return line
+
+    # Retrieve solvent in use
+    def _extract_solvent(self, inputfile, line):
+        if line[1:23] == 'Solvent              :':
+            solvent = line.split()[2].rstrip(',')
+            self.set_attribute('solvent', solvent)
+        return line
 
 
 class ChemShell(Logfile):
 
-    def __init__(self, *args, **kwargs):
+    """
+    Parser for ChemShell QM/MM logfiles.
+
+    Energy decompositions are collected as rows of values aligned to a
+    shared index of terms, and stored as `EnergyTable` objects at the end.
+    Lines that do not start with any of the `PREFIXES` are skipped right away.
 
+    As in `GaussianParser`, exceptions raised while extracting a line do
+    not stop the parse, and are collected in `parse_errors`.
+    """
+
+    PREFIXES = (' MM Energies', 'Contribution to energy from', 'QM/MM Energy:', ' cycle')
+    # Quick mode (see `parse_tail`). Coordinates are not parsed.
+    TAIL_ENERGY = 'QM/MM Energy:'
+    TAIL_ANCHORS = ()
+    TAIL_REQUIRED = ('scfenergies',)
+    # Incremental parsing (see `esigen.incremental`). Every handler is done
+    # by the time the QM/MM energy of the step is printed.
+    RESUME_AFTER = ('QM/MM Energy:', 'converged!', 'ChemShell exiting code')
+
+    def __init__(self, *args, **kwargs):
+        # Collection of attribute names to extract. None means all of them.
+        fields = kwargs.pop('fields', None)
         # Call the __init__ method of the superclass
         super(ChemShell, self).__init__(logname="ChemShell", *args, **kwargs)
+        self.fields = None if fields is None else frozenset(fields)
+        self._parse_mmenergies = fields is None or 'mmenergies' in self.fields
+        self._parse_contributions = fields is None or 'energycontributions' in self.fields
+        self.parse_errors = ParseErrors(self.logger)
 
     def __str__(self):
         """Return a string representation of the object."""
@@ -286,50 +727,348 @@ class ChemShell(Logfile):
         return label
 
     def before_parsing(self):
-        self.energycontributions = []
-        self.mmenergies = []
+        # Rows of values, and the column of each term in them
+        self.energycontributions, self._contribution_keys = [], {}
+        self.mmenergies, self._mmenergy_keys = [], {}
         self.scfenergies = []
 
     def after_parsing(self):
-        if self.energycontributions:
-            self.set_attribute('energycontributions', self.energycontributions)
-        if self.mmenergies:
-            self.set_attribute('mmenergies', self.mmenergies)
+        self.parse_errors.log_summary()
+        for name, keys in (('energycontributions', self._contribution_keys),
+                           ('mmenergies', self._mmenergy_keys)):
+            rows = getattr(self, name)
+            if not rows:
+                continue
+            values = np.full((len(rows), len(keys)), np.nan)
+            for i, row in enumerate(rows):
+                values[i, :len(row)] = row
+            table = EnergyTable.from_columns(sorted(keys, key=keys.get), values)
+            # Comparing the tables with themselves is pointless (and slow)
+            self.set_attribute(name, table, check_change=False)
+        if self.fields is not None:
+            _drop_unrequested(self, self.fields)
+
+    @staticmethod
+    def _add(keys, row, key, value):
+        column = keys.setdefault(key, len(keys))
+        if column < len(row):
+            row[column] = value
+        else:  # new terms always take the next column
+            row.append(value)
 
     def extract(self, inputfile, line):
         """Extract information from the file object inputfile."""
+        if not line.startswith(self.PREFIXES):
+            return
+        try:
+            self._extract(inputfile, line)
+        except Exception as e:
+            self.parse_errors.add('ChemShell', e, line)
 
-        if line[:12] == ' MM Energies':
-            mm_energies = {}
-            mm_energies['total'] = float(line.split()[-1])
+    def _extract(self, inputfile, line):
+        if line[:12] == ' MM Energies' and self._parse_mmenergies:
+            keys = self._mmenergy_keys
+            row = [np.nan] * len(keys)
+            self._add(keys, row, 'total', float(line.split()[-1]))
             line = next(inputfile)
             while line[:12]  != 'Contribution':
                 for group in line[:32], line[32:61], line[61:]:
                     source, value = group.split(':')
-                    mm_energies[source.strip()] = float(value.strip())
+                    self._add(keys, row, source.strip(), float(value.strip()))
                 line = next(inputfile)
-            self.mmenergies.append(mm_energies)
-        if line[:27] == "Contribution to energy from":
-            contributions = {}
+            self.mmenergies.append(row)
+        if line[:27] == "Contribution to energy from" and self._parse_contributions:
+            keys = self._contribution_keys
+            row = [np.nan] * len(keys)
             while line[:5] != "-----":
                 key, value = line.split(':')
-                contributions[key[27:].strip()] = float(value.split()[0])
+                self._add(keys, row, key[27:].strip(), float(value.split()[0]))
                 line = next(inputfile)
-            self.energycontributions.append(contributions)
+            self.energycontributions.append(row)
         if line[:13] == "QM/MM Energy:":
             self.scfenergies.append(float(line.split()[2].strip()))
         if line[:6] == ' cycle' and 'converged!' in line:
             self.optdone = [True]
 
-# Replace cclib default parser with our own
-chemshell_patched = False
-for i, trigger in enumerate(ccio_triggers):
-    parser, triggerlist, do_break = trigger
-    for query in triggerlist:
-        if "Gaussian" in query:
-            ccio_triggers[i] = (GaussianParser, triggerlist, do_break)
-            break
-        elif 'ChemShell' in query:
-            chemshell_patched = True
-if not chemshell_patched:
-    ccio_triggers.append((ChemShell, ['ChemShell'], True))
\ No newline at end of file
+
+# How much of a file is read to guess its type (see `sniff`)
+SNIFF_BYTES = 1 << 20
+
+
+def sniff(path, limit=None):
+    """
+    Guess the parser of `path` looking only at its first `limit` bytes, so
+    files that cannot be parsed are rejected without reading them in full.
+
+    Parameters
+    ----------
+    path : str
+        Logfile to inspect. It can be compressed (see `esigen.utils.open_logfile`).
+    limit : int, optional
+        How many bytes to read. Defaults to `SNIFF_BYTES`.
+
+    Returns
+    -------
+    parser : cclib.parser.logfileparser.Logfile subclass or None
+    stream : esigen.utils.LogfileStream or None
+        Stream over the whole file, ready to be passed to `parser`. The lines
+        already read are replayed from memory, so the file is not opened
+        (or decompressed) again. None if the parser could not be guessed.
+    """
+    if limit is None:
+        limit = SNIFF_BYTES
+    stream = open_logfile(path)
+    try:
+        head = stream.read(limit)
+        partial = False
+        if head and not head.endswith('\n'):
+            rest = stream.readline(limit)  # complete the last line
+            head += rest
+            # A line longer than `limit` is still cut, unless the file ended
+            partial = len(rest) == limit and not rest.endswith('\n')
+        lines = head.split('\n')
+        lines = [line + '\n' for line in lines[:-1]] + [line for line in lines[-1:] if line]
+        # A cut line could match a trigger that the whole line does not
+        parser = registry.find_parser(lines[:-1] if partial else lines)
+    except Exception:
+        stream.close()
+        raise
+    if parser is None:
+        stream.close()
+        return None, None
+    return parser, LogfileStream(stream, path, prefix=lines)
+
+
+def guess_parser(path, limit=None):
+    """
+    Parser class for `path`, or None if it cannot be guessed. See `sniff`.
+    """
+    parser, stream = sniff(path, limit=limit)
+    if stream is not None:
+        stream.close()
+    return parser
+
+
+def _tail_offset(text, energy, anchors):
+    """
+    Position in `text` of the line where the last step of the job begins:
+    the last of `anchors` found before the last `energy` line or, if no
+    anchors are given, the `energy` line itself. None if not found.
+    """
+    end = text.rfind(energy)
+    if end < 0:
+        return None
+    if anchors:
+        end = max(text.rfind(anchor, 0, end) for anchor in anchors)
+        if end < 0:
+            return None
+    # The first line of the block may be truncated, so it does not count
+    start = text.rfind('\n', 0, end)
+    if start < 0:
+        return None
+    return start + 1
+
+
+def parse_tail(path, parser, datatype=ccDataExtended, blocksize=1 << 20, **kwargs):
+    """
+    Parse only the last step of a job, reading the file backwards from the end.
+
+    Blocks of `blocksize` bytes are read from the end of `path` (doubling the
+    size every time) until the beginning of the last step is found, as defined
+    by the `TAIL_ENERGY` and `TAIL_ANCHORS` attributes of `parser`. Then, only
+    that portion of the file is fed to `parser`. This is enough to obtain the
+    final energy and geometry, and whether the optimization converged, at a
+    cost that depends on the length of the last step, not the whole file.
+
+    Parameters
+    ----------
+    path : str
+        Logfile to parse.
+    parser : cclib.parser.logfileparser.Logfile subclass
+        Parser class, as returned by `guess_parser`.
+    datatype : cclib.parser.ccData or subclass, optional
+    blocksize : int, optional=1MB
+        Size of the first block read from the end of the file.
+    **kwargs : passed to `parser`
+
+    Returns
+    -------
+    data : datatype instance or None
+        None is returned if `parser` does not support quick mode, if `path`
+        is compressed (it cannot be read backwards), if the last step does
+        not contain all the `TAIL_REQUIRED` attributes, or if it lacks the
+        optimization status while the previous job ended an optimization
+        (see `_optimized_before`). In that case, the file should be parsed
+        normally.
+    """
+    energy = getattr(parser, 'TAIL_ENERGY', None)
+    if energy is None or compression(path) is not None:
+        return None
+    anchors = parser.TAIL_ANCHORS
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while True:
+            start = max(size - blocksize, 0)
+            f.seek(start)
+            text = f.read().decode('utf-8', 'replace')
+            offset = _tail_offset(text, energy, anchors)
+            if offset is not None:
+                break
+            if start == 0:
+                return None
+            blocksize *= 2
+    logfile = name_logfile(parser(io.StringIO(text[offset:]), datatype=datatype, **kwargs), path)
+    logfile.datatype = datatype  # workaround
+    data = logfile.parse()
+    if not all(len(getattr(data, attr, ())) for attr in parser.TAIL_REQUIRED):
+        return None
+    fields = kwargs.get('fields')
+    if (getattr(parser, 'TAIL_OPTIMIZATION', ()) and getattr(data, 'optdone', None) is None
+            and (fields is None or 'optdone' in fields)):
+        # Byte where the last step begins (approximate if the text was not UTF-8)
+        end = start + len(text[:offset].encode('utf-8'))
+        if _optimized_before(path, parser, end, blocksize):
+            return None
+    return data
+
+
+def _optimized_before(path, parser, end, window):
+    """
+    Whether the job that precedes byte `end` of `path` ended an optimization,
+    as told by the `TAIL_OPTIMIZATION` lines printed after its last
+    `TAIL_ENERGY` line.
+
+    Only the `window` bytes before `end` are searched for the beginning of
+    the current job (`JOB_STARTS`). If none is found there, the file is not
+    read any further, and the job is assumed not to follow an optimization
+    (i.e. single points and running optimizations). Otherwise, the file is
+    read backwards from there until the last energy of the previous job.
+    """
+    starts = [line.encode('utf-8') for line in getattr(parser, 'JOB_STARTS', ())]
+    energy = parser.TAIL_ENERGY.encode('utf-8')
+    with open(path, 'rb') as f:
+        start = max(end - window, 0)
+        f.seek(start)
+        block = f.read(end - start)
+        job = max([block.rfind(line) for line in starts] + [-1])
+        if job < 0:
+            return False
+        previous = block.rfind(energy, 0, job)
+        while previous < 0 and start > 0:
+            window *= 2
+            new_start = max(end - window, 0)
+            f.seek(new_start)
+            block = f.read(start - new_start) + block
+            job += start - new_start
+            start = new_start
+            previous = block.rfind(energy, 0, job)
+    block = block[max(previous, 0):job]
+    return any(line.encode('utf-8') in block for line in parser.TAIL_OPTIMIZATION)
+
+
+
+def split_jobs(path, parser):
+    """
+    Locate the jobs contained in a multi-step logfile (i.e. Gaussian --Link1--),
+    as delimited by the `JOB_STARTS` and `JOB_ENDS` attributes of `parser`:
+    a new job begins at each line that starts a job, provided that a line
+    ending a job has been found since the previous one began. The file is
+    scanned memory-mapped, without decoding or parsing it.
+
+    Returns
+    -------
+    ranges : list of (int, int)
+        Start and end byte offsets of each job. Whatever follows the end of
+        a job (i.e. timings) belongs to it, and a job still running is
+        considered a job on its own. Parsers without `JOB_STARTS` and
+        `JOB_ENDS`, and compressed files, always produce a single job.
+    """
+    size = os.path.getsize(path)
+    starts = getattr(parser, 'JOB_STARTS', ())
+    ends = getattr(parser, 'JOB_ENDS', ())
+    if not starts or not ends or not size or compression(path) is not None:
+        return [(0, size)]
+
+    def positions(keywords):
+        found = []
+        for keyword in keywords:
+            keyword = keyword.encode('utf-8')
+            position = contents.find(keyword)
+            while position >= 0:
+                found.append(contents.rfind(b'\n', 0, position) + 1)  # line start
+                position = contents.find(keyword, position + len(keyword))
+        return sorted(found)
+
+    with open(path, 'rb') as f:
+        contents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            job_starts, job_ends = positions(starts), positions(ends)
+        finally:
+            contents.close()
+    boundaries = [0]
+    ended = iter(job_ends)
+    end = next(ended, None)
+    for start in job_starts:
+        # Skip the job ends found before the current job began
+        while end is not None and end < boundaries[-1]:
+            end = next(ended, None)
+        if end is not None and end < start:
+            boundaries.append(start)
+    return list(zip(boundaries, boundaries[1:] + [size]))
+
+
+def parse_job(path, start, end, parser, datatype=ccDataExtended, **kwargs):
+    """
+    Parse the bytes `start` to `end` of `path` with `parser`, as if they
+    were a logfile on their own. `**kwargs` are passed to `parser`.
+    Compressed files are always parsed in full.
+    """
+    if compression(path) is not None:
+        with LogfileStream(open_logfile(path), path) as stream:
+            logfile = name_logfile(parser(stream, datatype=datatype, **kwargs), path)
+            logfile.datatype = datatype  # workaround
+            return logfile.parse()
+    # Jobs are read from a memory map, so workers share the file pages
+    with MappedLogfile(path, start, end) as stream:
+        logfile = name_logfile(parser(stream, datatype=datatype, **kwargs), path)
+        logfile.datatype = datatype  # workaround
+        return logfile.parse()
+
+
+def _parse_job(args):
+    path, start, end, parser, datatype, kwargs = args
+    return parse_job(path, start, end, parser, datatype=datatype, **kwargs)
+
+
+def parse_jobs(path, parser, datatype=ccDataExtended, processes=None, **kwargs):
+    """
+    Parse each of the jobs found by `split_jobs` independently, in parallel.
+
+    Parameters
+    ----------
+    path : str
+        Logfile to parse.
+    parser : cclib.parser.logfileparser.Logfile subclass
+        Parser class, as returned by `guess_parser`.
+    datatype : cclib.parser.ccData or subclass, optional
+    processes : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        Use 1 to parse the jobs sequentially in this process.
+    **kwargs : passed to `parser`
+
+    Returns
+    -------
+    data : list of datatype instances
+        One per job, in the same order as in the file.
+    """
+    tasks = [(path, start, end, parser, datatype, kwargs)
+             for (start, end) in split_jobs(path, parser)]
+    if len(tasks) == 1 or processes == 1:
+        return [_parse_job(task) for task in tasks]
+    pool = Pool(processes=min(processes or cpu_count(), len(tasks)))
+    try:
+        return pool.map(_parse_job, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
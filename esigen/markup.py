@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Conversion of the rendered Markdown reports to HTML.
+
+Building a `markdown.Markdown` converter (and its extensions) takes longer
+than converting a typical report, so each thread keeps its own converter
+and resets it between uses (instances are not thread-safe).
+
+Converted reports are kept in a bounded in-memory cache (the last
+`HTML_CACHE_SIZE`), keyed by the SHA1 of the Markdown text (plus the
+Markdown version and extensions), so showing the same report again skips
+the conversion.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import, unicode_literals
+import hashlib
+import threading
+from collections import OrderedDict
+
+MARKDOWN_EXTENSIONS = ('markdown.extensions.tables',
+                       'markdown.extensions.fenced_code',
+                       'markdown.extensions.nl2br',
+                       'markdown.extensions.sane_lists')
+HTML_CACHE_SIZE = 32
+_LOCAL = threading.local()
+_HTML = OrderedDict()
+_HTML_LOCK = threading.Lock()
+
+
+def _converter():
+    """
+    Markdown converter of this thread, ready to be used.
+    """
+    converter = getattr(_LOCAL, 'converter', None)
+    if converter is None:
+        from markdown import Markdown
+        converter = _LOCAL.converter = Markdown(extensions=list(MARKDOWN_EXTENSIONS))
+    return converter.reset()
+
+
+def _key(text):
+    from markdown import __version__
+    sha1 = hashlib.sha1()
+    sha1.update(' '.join((__version__,) + MARKDOWN_EXTENSIONS).encode('utf-8'))
+    sha1.update(b'\0')
+    sha1.update(text.encode('utf-8'))
+    return sha1.hexdigest()
+
+
+def _remember(key, html):
+    with _HTML_LOCK:
+        _HTML.pop(key, None)
+        _HTML[key] = html  # most recently used last
+        while len(_HTML) > HTML_CACHE_SIZE:
+            _HTML.popitem(last=False)
+
+
+def clear_cache():
+    """
+    Forget the HTML kept in memory.
+    """
+    with _HTML_LOCK:
+        _HTML.clear()
+
+
+def markdown_to_html(text, cache=True):
+    """
+    Convert a Markdown report to HTML, like `markdown.markdown` with
+    the MARKDOWN_EXTENSIONS.
+
+    Parameters
+    ----------
+    text : str
+        Markdown source.
+    cache : bool, optional=True
+        Look up the HTML in the in-memory cache and store it there after
+        converting it.
+    """
+    if not cache:
+        return _converter().convert(text)
+    key = _key(text)
+    html = _HTML.get(key)
+    if html is None:
+        html = _converter().convert(text)
+    _remember(key, html)
+    return html
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentation of the parsers, to find out which of their handlers are
+responsible for slow parses.
+
+`ParserProfile.attach` wraps the `extract` method of a cclib parser instance
+and records, for each handler, the lines that triggered it, the lines it
+consumed from the file and the time spent on it. Handlers of the ESIgen
+parsers (see `GaussianParser.EXTRACTORS` in `esigen.io`) are timed
+individually. cclib handles everything else in a single `extract` method
+(and so do parsers without indexed handlers, like ChemShell), so its calls
+are grouped by the line that triggered them when they consume more lines
+(i.e. ' Standard orientation:'), and the remaining lines are aggregated
+as a whole.
+
+Instrumentation adds its own overhead, so the timings are only meaningful
+relative to each other. Use `esigen.ESIgenReport(path, profile=True)` or
+`esigen --profile-parser` to obtain a profile.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+import functools
+import types
+try:
+    from time import perf_counter as timer
+except ImportError:  # Python 2
+    from timeit import default_timer as timer
+
+
+class _CountingFile(object):
+
+    """
+    Proxy of the file object given to the handlers that counts the lines
+    read through it.
+    """
+
+    def __init__(self, inputfile):
+        self._inputfile = inputfile
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._inputfile)
+        self.count += 1
+        return line
+
+    next = __next__
+
+    def __getattr__(self, name):
+        return getattr(self._inputfile, name)
+
+
+def _label(line):
+    """
+    Short description of the line that triggered a handler: its first words,
+    up to the first one that contains a digit.
+    """
+    words = []
+    for word in line.split()[:4]:
+        if any(char.isdigit() for char in word):
+            break
+        words.append(word)
+    return ' '.join(words) or line.strip()[:20]
+
+
+class ParserProfile(object):
+
+    """
+    Lines matched, lines consumed and cumulative time of each parser handler.
+
+    Attributes
+    ----------
+    stats : dict
+        {handler: [matched, consumed, seconds]}. Calls to a single `extract`
+        method are named `<parser>: <trigger line>` if they consumed more
+        lines, and `<parser> (other lines)` otherwise. `<parser>` is `cclib`
+        for the ESIgen parsers with indexed handlers, and the name of the
+        parser class otherwise.
+    lines : int
+        Number of lines given to the parser.
+    elapsed : float
+        Total time of the parse, in seconds, if set by the caller. It also
+        includes reading the file and building the data object.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.lines = 0
+        self.elapsed = None
+
+    def _add(self, name, matched, consumed, seconds):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = [0, 0, 0.0]
+        stats[0] += matched
+        stats[1] += consumed
+        stats[2] += seconds
+
+    def attach(self, parser):
+        """
+        Instrument a parser instance. Must be called before parsing.
+        """
+        handlers = []
+        prefix = type(parser).__name__
+        dispatch = getattr(parser, '_dispatch', None)
+        if dispatch is not None:  # ESIgen parsers with indexed handlers
+            prefix = 'cclib'
+            wrapped = {}
+            for char, candidates in dispatch.items():
+                for i, (keyword, handler) in enumerate(candidates):
+                    if handler not in wrapped:
+                        wrapped[handler] = self._wrap_handler(handler, handlers)
+                    candidates[i] = (keyword, wrapped[handler])
+        # cclib checks the signature of the bound method
+        parser.extract = types.MethodType(self._wrap_extract(parser.extract, handlers, prefix), parser)
+        return parser
+
+    def _wrap_handler(self, handler, calls):
+        name = getattr(handler, '__name__', repr(handler))
+
+        @functools.wraps(handler)
+        def profiled(inputfile, line):
+            consumed = inputfile.count
+            start = timer()
+            try:
+                return handler(inputfile, line)
+            finally:
+                seconds = timer() - start
+                consumed = inputfile.count - consumed
+                self._add(name, 1, consumed, seconds)
+                calls.append((consumed, seconds))
+        return profiled
+
+    def _wrap_extract(self, extract, calls, prefix):
+        # The same proxy is reused while the parser is fed the same file
+        proxies = {}
+        other_lines = prefix + ' (other lines)'
+
+        def profiled(parser, inputfile, line):
+            proxy = proxies.get(id(inputfile))
+            if proxy is None or proxy._inputfile is not inputfile:
+                proxies.clear()
+                proxy = proxies[id(inputfile)] = _CountingFile(inputfile)
+            consumed = proxy.count
+            start = timer()
+            try:
+                return extract(proxy, line)
+            finally:
+                seconds = timer() - start
+                consumed = proxy.count - consumed
+                # Whatever the indexed handlers did not account for was done by extract
+                for handler_consumed, handler_seconds in calls:
+                    consumed -= handler_consumed
+                    seconds -= handler_seconds
+                del calls[:]
+                self.lines += 1
+                if consumed:
+                    self._add('{}: {}'.format(prefix, _label(line)), 1, consumed, seconds)
+                else:
+                    self._add(other_lines, 1, 0, seconds)
+        return profiled
+
+    def rows(self):
+        """
+        Statistics of each handler, sorted by cumulative time (slowest first).
+
+        Returns
+        -------
+        rows : list of (name, matched, consumed, seconds)
+        """
+        rows = [(name,) + tuple(stats) for (name, stats) in self.stats.items()]
+        return sorted(rows, key=lambda row: (-row[3], row[0]))
+
+    def table(self, limit=None):
+        """
+        Plain text table with the statistics of the `limit` slowest handlers.
+        """
+        rows = self.rows()
+        width = max([len(row[0]) for row in rows] + [len('Handler')])
+        template = '{:<%d}  {:>10}  {:>10}  {:>10}  {:>6}' % width
+        total = sum(row[3] for row in rows) or 1.0
+        lines = [template.format('Handler', 'Matched', 'Consumed', 'Time (s)', '%'),
+                 '-' * (width + 44)]
+        for name, matched, consumed, seconds in rows[:limit]:
+            lines.append(template.format(name, matched, consumed, '{:.4f}'.format(seconds),
+                                         '{:.1f}'.format(100 * seconds / total)))
+        lines.append('-' * (width + 44))
+        summary = '{} lines given to the parser, {:.4f} s in handlers'.format(self.lines,
+                                                                           sum(r[3] for r in rows))
+        if self.elapsed is not None:
+            summary += ', {:.4f} s in total'.format(self.elapsed)
+        lines.append(summary)
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.table()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Registry of the parsers that ESIgen can choose from to read a logfile.
+
+Each entry names a parser class, or its import path (`module:attribute`,
+resolved by `ParserEntry.load` when the entry is chosen), and tells how
+to recognize those files:
+
+- `phrases`: all of them must appear in the same line (case is ignored),
+  like the triggers of `cclib.io.ccio`.
+- `sniff`: a callable that receives each line (lowercased) and returns
+  True if it identifies the program. It takes precedence over `phrases`.
+
+The ESIgen parsers (`esigen.io.GaussianParser` and `esigen.io.ChemShell`)
+are registered here. Register your own with `register`; entries with the
+name of an existing one replace it::
+
+    from esigen.registry import register
+    register('MyProgram', 'mypackage.parsers:MyParser', phrases=['MyProgram v'])
+
+Registered entries are tried first, and the rest of the cclib parsers
+only if none of them recognizes the file. This differs from
+`cclib.io.ccio.guess_filetype` on purpose: a file recognized by ESIgen
+(or by your parsers) is read with them even if an earlier line matches a
+cclib trigger (i.e. a job script that echoes a TURBOMOLE path before the
+Gaussian header).
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+import importlib
+from collections import OrderedDict
+
+_REGISTRY = OrderedDict()
+_CCLIB_ENTRIES = None
+
+
+class ParserEntry(object):
+
+    """
+    A parser that has been registered, imported or not.
+
+    Parameters
+    ----------
+    name : str
+        Name of the program. Registering another entry with the same name
+        replaces this one.
+    target : str or class
+        Parser class (a cclib.parser.logfileparser.Logfile subclass), or its
+        import path as `module:attribute`.
+    phrases : sequence of str, optional
+        Phrases that identify the program when found in the same line.
+    sniff : callable, optional
+        Called with each lowercased line. Returns True if the line identifies
+        the program.
+    do_break : bool, optional=True
+        Whether the first matching line settles the choice. Otherwise, later
+        lines can still select other parsers (i.e. GAMESS vs GAMESS-UK).
+    """
+
+    def __init__(self, name, target, phrases=(), sniff=None, do_break=True):
+        if not phrases and sniff is None:
+            raise ValueError('Parser {} needs phrases or a sniff callable'.format(name))
+        self.name = name
+        self.target = target
+        self.phrases = tuple(phrase.lower() for phrase in phrases)
+        self.sniff = sniff
+        self.do_break = do_break
+        self._parser = None if isinstance(target, str) else target
+
+    def __repr__(self):
+        return 'ParserEntry({!r}, {!r})'.format(self.name, self.target)
+
+    @property
+    def loaded(self):
+        return self._parser is not None
+
+    def load(self):
+        """
+        Parser class of this entry, importing its module if needed.
+        """
+        if self._parser is None:
+            module, _, attribute = self.target.partition(':')
+            self._parser = getattr(importlib.import_module(module), attribute)
+        return self._parser
+
+    def locate(self, lines, text):
+        """
+        Index of the line that identifies the program: the first one if
+        `do_break`, else the last one. None if there is none.
+
+        Parameters
+        ----------
+        lines : list of str
+            Lowercased lines.
+        text : str
+            Concatenation of `lines`.
+        """
+        if self.sniff is None:
+            # Only files where all the phrases appear somewhere can match
+            if not all(phrase in text for phrase in self.phrases):
+                return None
+            if len(self.phrases) == 1:  # no need to check line by line
+                position = (text.find if self.do_break else text.rfind)(self.phrases[0])
+                return text.count('\n', 0, position)
+            phrases = self.phrases
+            match = lambda line: all(phrase in line for phrase in phrases)
+        else:
+            match = self.sniff
+        indices = range(len(lines)) if self.do_break else range(len(lines) - 1, -1, -1)
+        for i in indices:
+            if match(lines[i]):
+                return i
+        return None
+
+
+def register(name, target, phrases=(), sniff=None, do_break=True):
+    """
+    Add a parser to the registry (see `ParserEntry` for the parameters).
+    An entry with the same name is replaced, keeping its position.
+
+    Returns
+    -------
+    entry : ParserEntry
+    """
+    entry = ParserEntry(name, target, phrases=phrases, sniff=sniff, do_break=do_break)
+    _REGISTRY[name] = entry
+    return entry
+
+
+def unregister(name):
+    """
+    Remove the parser registered as `name`. Unknown names are ignored.
+    """
+    _REGISTRY.pop(name, None)
+
+
+def registered():
+    """
+    Registered entries, in the order they are tried.
+    """
+    return list(_REGISTRY.values())
+
+
+def _cclib_entries():
+    """
+    Entries built from `cclib.io.ccio.triggers`, except those replaced by
+    a registered entry.
+    """
+    global _CCLIB_ENTRIES
+    if _CCLIB_ENTRIES is None:
+        from cclib.io.ccio import triggers
+        _CCLIB_ENTRIES = [ParserEntry(parser.__name__, parser, phrases=phrases, do_break=do_break)
+                          for (parser, phrases, do_break) in triggers]
+    return [entry for entry in _CCLIB_ENTRIES if entry.name not in _REGISTRY]
+
+
+def _choose(entries, lines, text):
+    """
+    Choose among `entries` like `cclib.io.ccio.guess_filetype` does among
+    its triggers: the first line matched by a `do_break` entry wins (the
+    entry listed first, if several match it). Without those, the last line
+    matched by any entry (and the entry listed last).
+
+    `find_entry` calls it for the registered entries first, and only then
+    for the cclib ones, so the choice over all of them is not the same as
+    `guess_filetype` would make.
+    """
+    breaking, other = [], []
+    for order, entry in enumerate(entries):
+        index = entry.locate(lines, text)
+        if index is not None:
+            (breaking if entry.do_break else other).append((index, order, entry))
+    if breaking:
+        return min(breaking, key=lambda match: match[:2])[2]
+    if other:
+        return max(other, key=lambda match: match[:2])[2]
+    return None
+
+
+def find_entry(lines):
+    """
+    Entry of the parser that can read the file that begins with `lines`.
+    Registered entries are tried first, then the rest of the cclib ones
+    (see `_choose`).
+    None if no parser recognizes them.
+    """
+    lines = [line.lower() for line in lines]
+    text = ''.join(lines)
+    entry = _choose(registered(), lines, text)
+    if entry is None:
+        entry = _choose(_cclib_entries(), lines, text)
+    return entry
+
+
+def find_parser(lines):
+    """
+    Parser class for the file that begins with `lines` (see `find_entry`
+    and `ParserEntry.load`). None if no parser recognizes them.
+    """
+    entry = find_entry(lines)
+    return None if entry is None else entry.load()
+
+
+# ESIgen parsers
+register('Gaussian', 'esigen.io:GaussianParser', phrases=['Gaussian, Inc.'])
+register('ChemShell', 'esigen.io:ChemShell', phrases=['ChemShell'])
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Report templates: the builtin ones, the analysis of their variables and
+the Jinja environment that compiles them.
+
+This module is cheap to import (Jinja2 is only imported when a template
+has to be analyzed or compiled), so command-line tools can list the builtin
+templates in their help without loading the parsing machinery.
+
+All reports of a process share the same environment (see `get_environment`),
+so each template is compiled once per process. Builtin templates are also
+stored as Jinja bytecode under `$ESIGEN_CACHE_DIR/templates` (see
+`esigen.cache.default_cache_dir`), so new processes load them instead of
+compiling them again. Values that change from report to report (i.e. the
+`missing` placeholder) are passed in the render context, not as globals.
+
+There are two environments. By default, templates are rendered in a
+Jinja sandbox, which checks every attribute access and call they make.
+Trusted templates (the builtin ones and those given by the user that runs
+ESIgen) can be rendered with `trusted=True`, which uses a plain Jinja
+environment and skips those checks. Never trust templates received from
+third parties, like those submitted to the web server.
+
+`template_info` parses each template once to find out what it needs
+(variables, data fields, depictions), so callers can plan the parse and
+the render of many files without parsing the template again.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import, unicode_literals
+import os
+import sys
+import hashlib
+from collections import OrderedDict
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+__here__ = os.path.abspath(os.path.dirname(__file__))
+_lower = str.lower if sys.version_info.major == 3 else unicode.lower
+TEMPLATES_DIR = os.path.join(__here__, 'templates')
+BUILTIN_TEMPLATES = sorted(os.listdir(TEMPLATES_DIR), key=_lower)
+_ENVIRONMENTS = {}
+# Compiled templates built from strings, which Jinja does not cache
+_STRING_TEMPLATES = OrderedDict()
+_STRING_TEMPLATES_SIZE = 64
+# TemplateInfo of the templates seen so far, by the SHA1 of their source
+_TEMPLATE_INFO = OrderedDict()
+_TEMPLATE_INFO_SIZE = 128
+
+
+def template_source(template):
+    """
+    Source of `template`: one of the BUILTIN_TEMPLATES, a local file or
+    a Jinja string (returned as is).
+    """
+    if template in BUILTIN_TEMPLATES:
+        template = os.path.join(TEMPLATES_DIR, template)
+    if os.path.isfile(template):
+        with open(template) as f:
+            return f.read()
+    return template
+
+
+class TemplateInfo(object):
+
+    """
+    What a template needs in order to be rendered, as found by parsing its
+    source once. Obtain them with `template_info`, which keeps an index of
+    the templates seen so far, keyed by the SHA1 of their source.
+
+    Attributes
+    ----------
+    digest : str
+        SHA1 hexdigest of the source.
+    variables : frozenset of str
+        Names of the variables that the template uses without defining them.
+    image : bool
+        Whether it includes a static depiction (`image`), which must be
+        rendered before the template.
+    viewer3d : bool
+        Whether it includes the interactive 3D viewer (`viewer3d`).
+    """
+
+    def __init__(self, source, digest=None):
+        from jinja2.meta import find_undeclared_variables
+        from jinja2.sandbox import SandboxedEnvironment
+        self.digest = digest or _digest(source)
+        self.variables = frozenset(find_undeclared_variables(SandboxedEnvironment().parse(source)))
+        self.image = 'image' in self.variables
+        self.viewer3d = 'viewer3d' in self.variables
+        self._fields = {}
+
+    def __repr__(self):
+        return 'TemplateInfo({!r})'.format(self.digest)
+
+    def fields(self, datatype=None):
+        """
+        Data fields of `datatype` needed to render the template. See
+        `template_fields`.
+        """
+        if datatype is None:
+            from .io import ccDataExtended as datatype
+        fields = self._fields.get(datatype)
+        if fields is None:
+            variables = set(self.variables)
+            # 3D depictions are built out of the coordinates
+            if self.image or self.viewer3d:
+                variables.add('has_coordinates')
+            fields = self._fields[datatype] = frozenset(datatype.fields_for(variables))
+        return fields
+
+
+def _digest(source):
+    if not isinstance(source, bytes):
+        source = source.encode('utf-8')
+    return hashlib.sha1(source).hexdigest()
+
+
+def template_info(template='default.md'):
+    """
+    Metadata of `template` (see `TemplateInfo`). Templates are only parsed
+    the first time their source is seen.
+
+    Parameters
+    ----------
+    template : str, optional='default.md'
+        One of the BUILTIN_TEMPLATES, a local file or a Jinja string.
+
+    Returns
+    -------
+    info : TemplateInfo
+    """
+    source = template_source(template)
+    digest = _digest(source)
+    info = _TEMPLATE_INFO.pop(digest, None)
+    if info is None:
+        info = TemplateInfo(source, digest=digest)
+        while len(_TEMPLATE_INFO) >= _TEMPLATE_INFO_SIZE:
+            _TEMPLATE_INFO.popitem(last=False)
+    _TEMPLATE_INFO[digest] = info  # most recently used last
+    return info
+
+
+def template_variables(template='default.md'):
+    """
+    Names of the variables that `template` uses without defining them.
+
+    Parameters
+    ----------
+    template : str, optional='default.md'
+        One of the BUILTIN_TEMPLATES, a local file or a Jinja string.
+    """
+    return set(template_info(template).variables)
+
+
+def template_fields(template='default.md', datatype=None):
+    """
+    Data fields needed to render a template, as inferred from the variables
+    it references. Suitable for the `fields` option of `ESIgenReport`.
+
+    Parameters
+    ----------
+    template : str, optional='default.md'
+        One of the BUILTIN_TEMPLATES, a local file or a Jinja string.
+    datatype : cclib.parser.ccData or subclass, optional
+        Class that holds the parsed data. It must provide a `fields_for`
+        classmethod, like `esigen.io.ccDataExtended` (the default).
+    """
+    return set(template_info(template).fields(datatype))
+
+
+def template_cache_dir(trusted=False):
+    """
+    Location of the Jinja bytecode of the builtin templates. Sandboxed and
+    trusted templates compile to different code, so they are kept apart.
+    """
+    from .cache import default_cache_dir
+    return os.path.join(default_cache_dir(), 'templates', 'trusted' if trusted else 'sandboxed')
+
+
+def _bytecode_cache(trusted=False):
+    from jinja2 import FileSystemBytecodeCache
+    directory = template_cache_dir(trusted)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    except OSError:  # read-only home, etc: compile in memory only
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def get_environment(trusted=False):
+    """
+    Jinja environment shared by all the reports of this process, created
+    on first use. Its globals do not depend on any particular report.
+
+    Parameters
+    ----------
+    trusted : bool, optional=False
+        Return the plain Jinja environment instead of the sandboxed one.
+        Only use it for templates whose source you trust.
+    """
+    env = _ENVIRONMENTS.get(trusted)
+    if env is None:
+        from jinja2 import Environment, PackageLoader
+        from jinja2.sandbox import SandboxedEnvironment
+        from cclib.parser.utils import convertor
+        import numpy as np
+        cls = Environment if trusted else SandboxedEnvironment
+        env = cls(trim_blocks=True, lstrip_blocks=True,
+                  loader=PackageLoader('esigen', 'templates'),
+                  bytecode_cache=_bytecode_cache(trusted))
+        env.globals.update(builtins.__dict__)
+        # Make sure we get a consistent spacing for later replacing
+        env.globals['viewer3d'] = '{{ viewer3d }}'
+        env.globals['missing'] = None
+        env.globals['convertor'] = convertor
+        env.globals['np'] = np
+        _ENVIRONMENTS[trusted] = env
+    return env
+
+
+def get_template(template='default.md', trusted=False):
+    """
+    Compiled `template`: one of the BUILTIN_TEMPLATES, a local file or a
+    Jinja string. Compiled templates are cached, so asking again for the
+    same template (or the same source) is cheap.
+
+    Parameters
+    ----------
+    template : str, optional='default.md'
+        One of the BUILTIN_TEMPLATES, a local file or a Jinja string.
+    trusted : bool, optional=False
+        Compile it in the trusted environment (see `get_environment`).
+
+    Returns
+    -------
+    template : jinja2.Template
+        Its `source` attribute holds the source code.
+    """
+    env = get_environment(trusted)
+    if template in BUILTIN_TEMPLATES:
+        compiled = env.get_template(template)
+        if getattr(compiled, 'source', None) is None:
+            compiled.source = template_source(template)
+        return compiled
+    source = template_source(template)
+    key = trusted, source
+    compiled = _STRING_TEMPLATES.pop(key, None)
+    if compiled is None:
+        compiled = env.from_string(source)
+        compiled.source = source
+        while len(_STRING_TEMPLATES) >= _STRING_TEMPLATES_SIZE:
+            _STRING_TEMPLATES.popitem(last=False)
+    _STRING_TEMPLATES[key] = compiled  # most recently used last
+    return compiled
+
+
+def precompile(templates=None, trusted=False):
+    """
+    Compile the builtin templates (or `templates`) ahead of time, so the
+    first reports do not pay for it. Builtin templates are also written to
+    the bytecode cache, if it is available. Call it at install time or when
+    a worker starts.
+
+    Parameters
+    ----------
+    templates : list of str, optional
+        Defaults to BUILTIN_TEMPLATES.
+    trusted : bool, optional=False
+        Compile them for the trusted environment (see `get_environment`).
+
+    Returns
+    -------
+    compiled : list of str
+        Names of the templates that were compiled.
+    """
+    if templates is None:
+        templates = BUILTIN_TEMPLATES
+    compiled = []
+    for template in templates:
+        get_template(template, trusted=trusted)
+        compiled.append(template)
+    return compiled
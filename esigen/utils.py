@@ -4,11 +4,32 @@
 # Stdlib
 from __future__ import division, print_function
 import os
+import io
+import sys
+import bz2
+import mmap
+import gzip
+import codecs
+from itertools import chain
 from textwrap import dedent
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+import numpy as np
 from cclib.parser.utils import convertor, PeriodicTable
 
 
 PERIODIC_TABLE = PeriodicTable()
+# Element symbols indexed by atomic number (0 is a dummy atom)
+ELEMENTS = np.array([symbol or '' for symbol in PERIODIC_TABLE.element])
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz')
+# Magic numbers of the supported compression formats, and how to open them
+_COMPRESSION_FORMATS = ((b'\x1f\x8b', 'gzip', gzip.GzipFile),
+                        (b'BZh', 'bzip2', bz2.BZ2File),
+                        (b'\xfd7zXZ\x00', 'xz', lzma.LZMAFile if lzma else None))
+# Line boundaries recognized by str.splitlines, but not by text files
+_OTHER_LINE_BREAKS = (u'\x0b', u'\x0c', u'\x1c', u'\x1d', u'\x1e', u'\x85', u'\u2028', u'\u2029')
 
 def new_filename(path):
     i = 0
@@ -19,6 +40,218 @@ def new_filename(path):
     return path
 
 
+def compression(path):
+    """
+    Name of the compression format of `path` ('gzip', 'bzip2' or 'xz'),
+    as detected from its first bytes. None if it is not compressed.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, name, _ in _COMPRESSION_FORMATS:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def strip_compression(path):
+    """
+    Remove the compression extension (if any) from `path`.
+    """
+    name, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        return name
+    return path
+
+
+class LogfileStream(object):
+
+    """
+    Read-only, forward-only stream over a logfile, which first replays
+    the lines in `prefix` (i.e. those read to guess the file type) and
+    then continues with the rest of `stream`, so the file is read once.
+
+    It does not expose `seek`, so cclib does not try to find the end
+    of the file to report progress (which, for compressed files, would
+    decompress the whole file once more).
+    """
+
+    def __init__(self, stream, name, prefix=()):
+        self._stream = stream
+        self._lines = chain(prefix, stream)
+        self.name = name
+
+    def read(self):
+        return ''.join(self._lines)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._lines)
+    next = __next__
+
+    def close(self):
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MappedLogfile(object):
+
+    """
+    Read-only text stream over the bytes `start` to `end` of a logfile,
+    served from a memory map of the file.
+
+    Lines are decoded in blocks of `blocksize` bytes straight from the
+    mapped pages, without copying them to intermediate buffers first.
+    Worker processes reading the same file share its pages in the OS cache.
+    Lines are the same that a file opened in text mode would yield
+    (universal newlines, undecodable bytes ignored).
+
+    `read` and `readline` are meant to inspect the beginning of the file
+    (see `esigen.io.sniff`) and must not be used once iteration has started.
+    Like `LogfileStream`, it does not expose `seek`.
+    """
+
+    def __init__(self, path, start=0, end=None, blocksize=1 << 18):
+        self.name = path
+        self.blocksize = blocksize
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._end = size if end is None else min(end, size)
+        self._pos = min(start, self._end)
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:  # empty files cannot be mapped
+            self._map = b''
+        try:
+            self._view = memoryview(self._map)
+        except TypeError:  # Python 2 mmaps do not support memoryview
+            self._view = self._map
+        self._lines = None
+
+    def _decode(self, start, end):
+        text = codecs.utf_8_decode(self._view[start:end], 'ignore', True)[0]
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
+    def _safe_end(self, end):
+        # Do not split multibyte characters or \r\n pairs
+        if end >= self._end:
+            return self._end
+        while end > self._pos and ord(self._map[end:end + 1]) & 0xC0 == 0x80:
+            end -= 1
+        if end > self._pos and self._map[end - 1:end + 1] == b'\r\n':
+            end -= 1
+        return end
+
+    def _blocks(self):
+        while self._pos < self._end:
+            start = self._pos
+            stop = min(start + self.blocksize, self._end)
+            while stop < self._end:
+                newline = self._map.rfind(b'\n', start, stop)
+                if newline >= 0:
+                    stop = newline + 1
+                    break
+                stop = min(stop + (stop - start), self._end)
+            self._pos = stop
+            text = self._decode(start, stop)
+            if not any(char in text for char in _OTHER_LINE_BREAKS):
+                yield text.splitlines(True)
+            else:
+                lines = text.split('\n')
+                yield [line + '\n' for line in lines[:-1]] + [line for line in lines[-1:] if line]
+
+    def read(self, size=-1):
+        end = self._end if size is None or size < 0 else self._safe_end(self._pos + size)
+        text = self._decode(self._pos, end)
+        self._pos = end
+        return text
+
+    def readline(self, size=-1):
+        end = self._map.find(b'\n', self._pos, self._end)
+        end = self._end if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, self._safe_end(self._pos + size))
+        return self.read(end - self._pos)
+
+    def __iter__(self):
+        if self._lines is None:
+            self._lines = chain.from_iterable(self._blocks())
+        return self._lines
+
+    def __next__(self):
+        return next(iter(self))
+    next = __next__
+
+    def close(self):
+        if self._lines is not None:
+            self._lines = iter(())
+        if hasattr(self._view, 'release'):
+            self._view.release()  # otherwise, the map cannot be closed
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_logfile(path):
+    """
+    Open `path` for reading as text. Plain files are memory-mapped (see
+    `MappedLogfile`). Compressed files (gzip, bzip2, xz) are decompressed on
+    the fly, without temporary files. Undecodable bytes are ignored, as cclib does.
+    """
+    kind = compression(path)
+    if kind is None:
+        if sys.version_info.major == 2:
+            # unicode lines confuse cclib in Python 2
+            return open(path)
+        return MappedLogfile(path)
+    opener = dict((name, opener) for (_, name, opener) in _COMPRESSION_FORMATS)[kind]
+    if opener is None:
+        raise ValueError('File {} is {}-compressed, but the module to read it '
+                         'is not available'.format(path, kind))
+    return io.TextIOWrapper(opener(path, 'rb'), errors='ignore')
+
+
+def stoichiometry(atomnos, charge=0):
+    """
+    Formula of a molecule in the Hill system, like `cclib.method.Nuclear`
+    would report it (i.e. `C2H6O`, `CH3(+1)`).
+
+    Parameters
+    ----------
+    atomnos : array of int
+        Atomic number of each atom.
+    charge : int, optional=0
+    """
+    counts = np.bincount(np.asarray(atomnos, dtype=int))
+    present = np.flatnonzero(counts)
+    counts = dict(zip(ELEMENTS[present].tolist(), counts[present].tolist()))
+    order = []
+    if 'C' in counts:
+        order.append('C')
+        if 'H' in counts:
+            order.append('H')
+    order.extend(sorted(symbol for symbol in counts if symbol not in order))
+    formula = ''.join(symbol if counts[symbol] == 1 else '{}{}'.format(symbol, counts[symbol])
+                      for symbol in order)
+    if charge:
+        formula += '({}{})'.format('+' if charge > 0 else '-', int(abs(charge)))
+    return formula
+
+
 def greeting():
     from esigen import __version__
     s = """    Created using ESIgen v{version}
@@ -15,9 +15,11 @@ import os
 import json
 import sys
 from uuid import uuid4
+from collections import namedtuple
 import datetime
 import shutil
 import hashlib
+import io
 from textwrap import dedent
 from zipfile import ZipFile, ZIP_DEFLATED
 try:
@@ -28,12 +30,16 @@ import numpy as np
 import requests
 from requests import HTTPError
 from flask import (Flask, Response, request, redirect, url_for, render_template,
-                   send_from_directory, send_file, jsonify, session, g)
+                   send_from_directory, send_file, jsonify, session, g, stream_with_context)
 from flask.json import JSONEncoder
 from werkzeug.utils import secure_filename
 from requests_oauthlib import OAuth2Session
 from oauthlib.oauth2 import MobileApplicationClient, MissingCodeError
-from .core import ESIgenReport, BUILTIN_TEMPLATES
+from .core import ESIgenReport, BUILTIN_TEMPLATES, template_fields
+from .batch import process
+from .templating import precompile, template_info
+from .io import EnergyTable
+from .utils import COMPRESSED_EXTENSIONS, strip_compression
 from ._webhooks import Figshare, Zenodo
 
 HAS_PYMOL = None
@@ -55,6 +61,9 @@ if os.environ.get('IN_PRODUCTION'):
     PRODUCTION = True
     sslify = SSLify(app)
 
+# Compile the report templates when the worker starts, not on its first request
+precompile(trusted=True)
+
 
 GITHUB_CLIENT_ID = os.environ.get('GITHUB_CLIENT_ID')
 GITHUB_CLIENT_SECRET = os.environ.get('GITHUB_CLIENT_SECRET')
@@ -95,7 +104,10 @@ app.jinja_env.globals['IN_PRODUCTION'] = PRODUCTION
 app.jinja_env.globals['GITHUB'] = GITHUB
 app.jinja_env.globals['FIGSHARE'] = FIGSHARE
 app.jinja_env.globals['HEROKU_RELEASE_VERSION'] = os.environ.get('HEROKU_RELEASE_VERSION', '')
-ALLOWED_EXTENSIONS = set(('.out', '.log', '.adfout', '.qfi'))
+LOGFILE_EXTENSIONS = ('.out', '.log', '.adfout', '.qfi')
+# Compressed logfiles are accepted too (i.e. .log.gz)
+ALLOWED_EXTENSIONS = set(ext + compressed for ext in LOGFILE_EXTENSIONS
+                         for compressed in ('',) + COMPRESSED_EXTENSIONS)
 URL_KWARGS = dict(_external=True, _scheme='https') if PRODUCTION else {}
 VERIFY_KWARGS = {} if PRODUCTION else {'verify': False}
 
@@ -105,9 +117,16 @@ class NumpyJSONEncoder(JSONEncoder):
         if isinstance(obj, np.integer):
             return int(obj)
         elif isinstance(obj, np.floating):
-            return float(obj)
+            return None if np.isnan(obj) else float(obj)
         elif isinstance(obj, np.ndarray):
+            # NaN (i.e. variables missing from a scan step) is not valid JSON
+            if obj.dtype.kind == 'f' and np.isnan(obj).any():
+                obj = np.where(np.isnan(obj), None, obj.astype(object))
+            return obj.tolist()
+        elif isinstance(obj, EnergyTable):
             return obj.tolist()
+        elif isinstance(obj, datetime.timedelta):  # i.e. metadata['cpu_time']
+            return obj.total_seconds()
         elif isinstance(obj, dict):
             return {k: self.default(v) for (k, v) in obj.items()}
         else:
@@ -218,34 +237,41 @@ def report(uuid, template='default', css='github', missing='N/A',
     else:
         preview = None
     missing = missing[:10] if missing is not None else None
-    json_dict = {}
-    cjson_dict = {}
-    for fn in sorted(os.listdir(root)):
-        if os.path.splitext(fn)[1] not in ALLOWED_EXTENSIONS:
-            continue
-        path = os.path.join(root, fn)
-        molecule = reporter(path, missing=missing)
-        report = molecule.report(template=template, preview=preview, process_markdown=html)
-        reports.append((molecule, report))
-        json_dict[molecule.basename] = molecule.data_as_dict()
-        cjson_dict[molecule.basename] = json.loads(molecule.data_as_cjson())
-        with open(os.path.join(root, molecule.name + '.md'), 'w') as f:
-            f.write(report)
-        if molecule.data.has_coordinates:
-            with open(os.path.join(root, molecule.name + '.pdb'), 'w') as f:
-                f.write(molecule.data.pdb_block)
-            with open(os.path.join(root, molecule.name + '.xyz'), 'w') as f:
-                f.write(molecule.data.xyz_block)
-            with open(os.path.join(root, molecule.name + '.cml'), 'w') as f:
-                f.write(molecule.data.cml_block)
+    # Engines that export all the parsed data need a full parse
+    if engine in PARTIAL_ENGINES:
+        fields = template_fields(template) | COORDINATES_FIELDS
+    else:
+        fields = None
+    paths = [os.path.join(root, fn) for fn in sorted(os.listdir(root))
+             if _allowed_extension(fn)]
+    # Only the builtin templates are trusted; custom ones stay in the sandbox
+    trusted = not custom_template and template in BUILTIN_TEMPLATES
+    # Workers write each report to <root>/<name>.md while rendering it, and
+    # the engines read them back one at a time (see `_report_texts`). The
+    # server handles each request in its own thread, so no pool is started
+    results = process(paths, template, reporter=reporter, processes=1, ordered=True,
+                      reporter_kwargs=dict(missing=missing, fields=fields),
+                      report_kwargs=dict(preview=preview, process_markdown=html,
+                                         trusted=trusted),
+                      output=root)
+    # Each file is exported once processed, so only one is kept in memory
+    exports = _Exports(root, engine)
+    try:
+        for result in results:
+            if result.error is not None:
+                app.logger.warning('Could not process %s: %s', result.path, result.error)
+                continue
+            for e in result.molecule.parse_errors or ():
+                app.logger.warning('%d lines of %s could not be parsed by %s (%s)',
+                                   e['count'], result.path, e['handler'], e['exception'])
+            reports.append(exports.add(result.molecule, result.report))
+    finally:
+        exports.close()
     if not reports:
         return redirect(url_for("index", message="File(s) could not be parsed!", **URL_KWARGS))
-    with open(os.path.join(root, molecule.name + '.json'), 'w') as f:
-        f.write(json.dumps(json_dict, cls=NumpyJSONEncoder))
-    with open(os.path.join(root, molecule.name + '.cjson'), 'w') as f:
-        f.write(json.dumps(cjson_dict, cls=NumpyJSONEncoder))
     session.uuid = uuid
-    return EXPORT_ENGINES[engine](reports=reports, css=css, uuid=uuid, template=template, root=root)
+    return EXPORT_ENGINES[engine](reports=reports, css=css, uuid=uuid, template=template, root=root,
+                                  exports=exports)
 
 
 @app.route('/export/')
@@ -259,21 +285,205 @@ def export(target=None, uuid=None):
 
 
 
+class WebReport(namedtuple('WebReport', 'name basename report')):
+
+    """
+    What `report` keeps of each processed file, once its data is on disk.
+
+    Attributes
+    ----------
+    name, basename : str
+        Same as in `ESIgenReport`.
+    report : str
+        Path to the rendered report.
+    """
+
+    __slots__ = ()
+
+
+class _JSONObjectFile(object):
+
+    """
+    JSON object written to `path` one member at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w')
+        self._file.write('{')
+        self._members = 0
+
+    def add(self, key, value):
+        """
+        Add a member, with its `value` already encoded as JSON.
+        """
+        self._file.write('{}{}: '.format(', ' if self._members else '', json.dumps(key)))
+        self._file.write(value)
+        self._members += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write('}')
+            self._file.close()
+
+
+class _Exports(object):
+
+    """
+    Files offered for download by `report`, written as each file is
+    processed so its reporter can be released right away.
+
+    The coordinates of each molecule are written to the upload directory
+    (`.pdb`, `.xyz` and `.cml`). Unless the engine is in `PARTIAL_ENGINES`
+    (their parse only keeps some fields), the data of all of them is
+    gathered in `<name>.json` and `<name>.cjson`, after the last molecule.
+    The response of the json and trajectory engines is written to `spool`,
+    under `EXPORTS`; nothing else is written for the rest of engines.
+
+    Parameters
+    ----------
+    root : str
+        Upload directory.
+    engine : str
+        Engine that will produce the response.
+    """
+
+    def __init__(self, root, engine):
+        self.root = root
+        self.name = None
+        self.spool = None
+        directory = os.path.join(root, EXPORTS)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Concurrent requests on the same upload must not share files
+        prefix = os.path.join(directory, uuid4().hex)
+        self._data = self._cjson = None
+        if engine not in PARTIAL_ENGINES:
+            self._data = _JSONObjectFile(prefix + '.json')
+            self._cjson = _JSONObjectFile(prefix + '.cjson')
+        self._response = self._trajectory = None
+        if engine == 'json':
+            self._response = _JSONObjectFile(prefix + '.response.json')
+            self.spool = self._response.path
+        elif engine == 'trajectory':
+            self.spool = prefix + '.trajectory.xyz'
+            self._trajectory = open(self.spool, 'w')
+
+    def add(self, molecule, report):
+        """
+        Export the data of `molecule`, whose report was written to `report`.
+
+        Returns
+        -------
+        WebReport
+        """
+        data = molecule.data
+        if data.has_coordinates:
+            with open(os.path.join(self.root, molecule.name + '.pdb'), 'w') as f:
+                f.write(data.pdb_block)
+            with open(os.path.join(self.root, molecule.name + '.xyz'), 'w') as f:
+                f.write(data.xyz_block)
+            with open(os.path.join(self.root, molecule.name + '.cml'), 'w') as f:
+                f.write(data.cml_block)
+        if self._data is not None:
+            data_json = json.dumps(molecule.data_as_dict(), cls=NumpyJSONEncoder)
+            self._data.add(molecule.basename, data_json)
+            self._cjson.add(molecule.basename, molecule.data_as_cjson())
+        if self._response is not None:
+            self._response.add(molecule.basename, '{{"report": {}, "data": {}}}'.format(
+                               json.dumps(_read(report)), data_json))
+        if self._trajectory is not None and data.has_coordinates:
+            self._trajectory.writelines(data.xyz_trajectory(label='{} step'.format(molecule.name)))
+        self.name = molecule.name
+        return WebReport(molecule.name, molecule.basename, report)
+
+    def close(self):
+        """
+        Finish the files. The data of all the molecules, if gathered, is
+        moved to the upload directory; without molecules, everything is
+        removed.
+        """
+        for f in (self._data, self._cjson, self._response, self._trajectory):
+            if f is not None:
+                f.close()
+        for exported, ext in ((self._data, '.json'), (self._cjson, '.cjson')):
+            if exported is None:
+                continue
+            if self.name is None:
+                os.remove(exported.path)
+            else:
+                os.rename(exported.path, os.path.join(self.root, self.name + ext))
+        if self.name is None and self.spool is not None:
+            os.remove(self.spool)
+
+    def path(self, ext):
+        """
+        Where the data of all the molecules was exported as `ext`.
+        """
+        return os.path.join(self.root, self.name + ext)
+
+
+def _read(path):
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _stream_file(path, remove=False):
+    """
+    Yield the contents of `path` in chunks, and optionally remove it once done.
+    """
+    try:
+        with open(path) as f:
+            for chunk in iter(lambda: f.read(1 << 16), ''):
+                yield chunk
+    finally:
+        if remove:
+            os.remove(path)
+
+
+def _uploaded_files(root, extensions=None):
+    """
+    Paths of the files in an upload directory, except the data in `EXPORTS`.
+    """
+    for base, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d != EXPORTS]
+        for filename in files:
+            if extensions and os.path.splitext(filename)[1] not in extensions:
+                continue
+            yield os.path.join(base, filename)
+
+
+def _report_texts(reports):
+    """
+    Read the report files written by `report` one at a time.
+
+    Yields
+    ------
+    molecule, text : WebReport, str
+    """
+    for molecule in reports:
+        yield molecule, _read(molecule.report)
+
+
+def _stream_template(template_name, **context):
+    """
+    Like `render_template`, but yields the page in chunks as it is rendered.
+    """
+    app.update_template_context(context)
+    return app.jinja_env.get_template(template_name).generate(context)
+
+
 def _engine_html(reports, css, uuid, template, **kwargs):
-    return render_template('report.html', css=css, uuid=uuid, reports=reports,
-                           ngl='{{ viewer3d }}' in reports[0][1], template=template)
+    page = _stream_template('report.html', css=css, uuid=uuid, reports=_report_texts(reports),
+                            ngl=template_info(template).viewer3d, template=template)
+    return Response(stream_with_context(page))
 
 
 def _engine_zip(root=None, uuid=None, extensions=None, **kwargs):
     memfile = BytesIO()
     with ZipFile(memfile, 'w', ZIP_DEFLATED) as zf:
-        for base, dirs, files in os.walk(root):
-            for filename in files:
-                if extensions:
-                    name, ext = os.path.splitext(filename)
-                    if ext not in extensions:
-                        continue
-                zf.write(os.path.join(base, filename), arcname=filename)
+        for path in _uploaded_files(root, extensions):
+            zf.write(path, arcname=os.path.basename(path))
     memfile.seek(0)
     if extensions is not None:
         att_filename = '{}-{}.zip'.format(uuid, '-'.join([ext[1:] for ext in extensions]))
@@ -283,7 +493,10 @@ def _engine_zip(root=None, uuid=None, extensions=None, **kwargs):
 
 
 def _engine_md(reports, **kwargs):
-    return Response('\n'.join([r for (m,r) in reports]), content_type='text/plain')
+    def texts():
+        for i, (molecule, text) in enumerate(_report_texts(reports)):
+            yield '\n' + text if i else text
+    return Response(texts(), content_type='text/plain')
 
 
 def _engine_xyz(reports, **kwargs):
@@ -294,18 +507,19 @@ def _engine_cml(reports, **kwargs):
     return _engine_zip(extensions=('.cml',), **kwargs)
 
 
-def _engine_cjson(reports, **kwargs):
-    d = {}
-    for molecule, report in reports:
-        d[molecule.basename] = json.loads(molecule.data_as_cjson())
-    return jsonify(d)
+def _engine_trajectory(reports, uuid, exports, **kwargs):
+    headers = {'Content-Disposition':
+               'attachment; filename={}-trajectory.xyz'.format(uuid)}
+    return Response(_stream_file(exports.spool, remove=True), content_type='chemical/x-xyz',
+                    headers=headers)
+
+
+def _engine_cjson(reports, exports, **kwargs):
+    return Response(_stream_file(exports.path('.cjson')), content_type='application/json')
 
 
-def _engine_json(reports, **kwargs):
-    d = {}
-    for molecule, report in reports:
-        d[molecule.basename] = {'report': report, 'data': molecule.data_as_dict()}
-    return jsonify(d)
+def _engine_json(reports, exports, **kwargs):
+    return Response(_stream_file(exports.spool, remove=True), content_type='application/json')
 
 
 def _engine_gist(reports, uuid, **kwargs):
@@ -347,10 +561,9 @@ if GITHUB:
         gist_data = {'description': "ESIgen report #{}".format(uuid),
                     'public': False, 'files': {}}
 
-        for base, dirs, files in os.walk(root):
-            for filename in files:
-                with open(os.path.join(base, filename)) as f:
-                    gist_data['files'][filename] = {'content': f.read()}
+        for path in _uploaded_files(root):
+            with open(path) as f:
+                gist_data['files'][os.path.basename(path)] = {'content': f.read()}
 
         now = datetime.datetime.now().strftime("%Y-%m-%d_%H%M")
         gist_data['files']['{}-ESIgen.md'.format(now )] = {'content':
@@ -424,9 +637,8 @@ if FIGSHARE:
             raise
         if article_id is None:
             return redirect(url_for("index", message="Could not create article on FigShare", **URL_KWARGS))
-        for base, dirs, files in os.walk(root):
-            for filename in files:
-                figshare.upload_files(article_id, os.path.join(base, filename))
+        for path in _uploaded_files(root):
+            figshare.upload_files(article_id, path)
 
         return redirect(article_url)
 
@@ -491,9 +703,8 @@ if ZENODO:
             raise
         if article_id is None:
             return redirect(url_for("index", message="Could not create article on Zenodo", **URL_KWARGS))
-        for base, dirs, files in os.walk(root):
-            for filename in files:
-                zenodo.upload_files(article_id, os.path.join(base, filename))
+        for path in _uploaded_files(root):
+            zenodo.upload_files(article_id, path)
 
         return redirect(article_url)
 
@@ -532,10 +743,14 @@ def _modification_date(filename):
     return datetime.datetime.fromtimestamp(t)
 
 
+def _allowed_extension(filename):
+    return os.path.splitext(strip_compression(filename))[1].lower() in LOGFILE_EXTENSIONS
+
+
 def allowed_filename(*filenames):
     for filename in filenames:
         fn = filename.filename
-        if '.' in fn and os.path.splitext(fn)[1].lower() in ALLOWED_EXTENSIONS:
+        if '.' in fn and _allowed_extension(fn):
             yield filename
 
 
@@ -553,6 +768,7 @@ EXPORT_ENGINES = {
     'zip': _engine_zip,
     'xyz': _engine_xyz,
     'cml': _engine_cml,
+    'trajectory': _engine_trajectory,
     'cjson': _engine_cjson,
     'json': _engine_json,
     'gist': _engine_gist,
@@ -560,6 +776,11 @@ EXPORT_ENGINES = {
     'figshare': _engine_figshare,
     'zenodo': _engine_zenodo,
 }
+# These only export the report and the coordinates (.pdb, .xyz, .cml, trajectories)
+PARTIAL_ENGINES = ('html', 'md', 'xyz', 'cml', 'trajectory')
+COORDINATES_FIELDS = frozenset(('natom', 'atomnos', 'atomcoords'))
+# Subdirectory of each upload with the files being exported (see `_Exports`)
+EXPORTS = '.exports'
 EXPORT_TARGETS = {
     'gist': 'GitHub Gist',
     'figshare': 'Figshare',
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Array-based writers for molecular structure formats (XYZ, PDB, CML).
+
+Each writer builds the format string of the whole file once and fills it
+with a single %-formatting pass over the flattened coordinates, instead of
+formatting every atom separately. The output is identical to the per-atom
+implementations they replace (see `devtools/benchmarks/bench_writers.py`).
+
+All of them take the element symbols of the atoms (`atoms`, a sequence of
+str) and their cartesian coordinates (`coords`, an (N, 3) array), and return
+text. Pass a file object as `f` to write the text to it instead.
+"""
+
+# Stdlib
+from __future__ import division, print_function, absolute_import
+# 3rd party
+import numpy as np
+
+_XYZ_ROW = '%-4s % 15.6f % 15.6f % 15.6f\n'
+_PDB_ROW = ('%-6s%5d %s%s%d%s UNK     1    %8.3f%8.3f%8.3f  1.00  0.00          %2s  \n')
+_PADDING = np.array(['', ' ', '  ', '   '], dtype=object)
+_POWERS_OF_TEN = 10 ** np.arange(1, 19)
+_CML_ROW = '    <atom id="a%d" elementType="%s" x3="%.10f" y3="%.10f" z3="%.10f" />\n'
+_CML_HEAD = ('<?xml version=\'1.0\' encoding=\'utf-8\'?>\n'
+             '<molecule xmlns="http://www.xml-cml.org/schema">\n')
+_CML_TAIL = '  <bondArray />\n</molecule>\n'
+
+
+def _fill(row, columns, nrows):
+    """
+    Repeat `row` `nrows` times and fill it with the values of `columns`
+    (one sequence of length `nrows` per %-placeholder in `row`).
+    """
+    if not nrows:
+        return ''
+    table = np.empty((nrows, len(columns)), dtype=object)
+    for i, column in enumerate(columns):
+        table[:, i] = column
+    return (row * nrows) % tuple(table.ravel().tolist())
+
+
+def _output(text, f):
+    if f is None:
+        return text
+    f.write(text)
+
+
+def _counters(groups):
+    """
+    1-based index of each item among those of the same group, given the
+    (integer) group of each item.
+    """
+    order = np.argsort(groups, kind='mergesort')
+    positions = np.arange(len(groups))
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[order][1:] != groups[order][:-1]
+    starts = np.maximum.accumulate(np.where(first, positions, 0))
+    counters = np.empty(len(groups), dtype=int)
+    counters[order] = positions - starts + 1
+    return counters
+
+
+def xyz(atoms, coords, f=None):
+    """
+    XYZ coordinates block (no atom count nor title lines).
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    text = _fill(_XYZ_ROW, [atoms, coords[:, 0], coords[:, 1], coords[:, 2]], len(coords))
+    return _output(text[:-1], f)
+
+
+def iter_xyz_frames(atoms, frames, titles=None, chunksize=1 << 20):
+    """
+    Multi-frame XYZ file, with the atom count and a title line per frame.
+    The text is generated in chunks of about `chunksize` atoms, so long
+    trajectories can be streamed without building the whole file in memory.
+
+    Parameters
+    ----------
+    atoms : sequence of str
+    frames : (M, N, 3) array
+        Coordinates of each frame.
+    titles : sequence of str, optional
+        Title line of each frame. Defaults to `Frame i` (indexed at 1).
+    chunksize : int, optional
+        Number of atoms formatted at once.
+
+    Yields
+    ------
+    text : str
+        A group of complete frames.
+    """
+    frames = np.asarray(frames, dtype=float)
+    nframes, natoms = frames.shape[0], len(atoms)
+    if titles is None:
+        titles = ['Frame {}'.format(i) for i in range(1, nframes + 1)]
+    atoms = np.asarray(atoms)
+    step = max(1, chunksize // max(natoms, 1))
+    for start in range(0, nframes, step):
+        chunk = frames[start:start + step]
+        values = np.empty((len(chunk), natoms, 4), dtype=object)
+        values[:, :, 0] = atoms
+        values[:, :, 1:] = chunk
+        table = np.empty((len(chunk), 2 + 4 * natoms), dtype=object)
+        table[:, 0] = natoms
+        table[:, 1] = titles[start:start + step]
+        table[:, 2:] = values.reshape(len(chunk), -1)
+        yield (('%d\n%s\n' + _XYZ_ROW * natoms) * len(chunk)) % tuple(table.ravel().tolist())
+
+
+def xyz_frames(atoms, frames, titles=None, f=None):
+    """
+    Multi-frame XYZ file. See `iter_xyz_frames`.
+    """
+    chunks = iter_xyz_frames(atoms, frames, titles=titles)
+    if f is None:
+        return ''.join(chunks)
+    for chunk in chunks:
+        f.write(chunk)
+
+
+def pdb(atoms, coords, f=None):
+    """
+    Single-model PDB file. All atoms belong to the same UNK residue and are
+    named after their element and their index among those of the same element.
+    """
+    atoms = np.asarray(atoms, dtype=str)
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    elements, groups = np.unique(atoms, return_inverse=True)
+    groups = groups.ravel()
+    records = np.array(['ATOM' if element.upper() in 'CHONPS' else 'HETATM'
+                        for element in elements.tolist()], dtype=object)
+    # Atom names are centered in 4 columns: ' C1 ', 'C12 ', 'C123'
+    counters = _counters(groups)
+    digits = np.searchsorted(_POWERS_OF_TEN, counters, side='right') + 1
+    lengths = np.char.str_len(elements)[groups] + digits
+    short = lengths == 2
+    padding = _PADDING[np.clip(4 - lengths - short, 0, 3)]
+    text = _fill(_PDB_ROW, [records[groups], np.arange(1, len(atoms) + 1),
+                            _PADDING[short.astype(int)], atoms, counters, padding,
+                            coords[:, 0], coords[:, 1], coords[:, 2], atoms],
+                 len(atoms))
+    return _output('TITLE unknown\nMODEL 1\n' + text + 'ENDMDL\nEND\n', f)
+
+
+def cml(atoms, coords, f=None):
+    """
+    CML molecule with the atoms and their coordinates, as written by
+    `cclib.io.CML` when Open Babel is not available (without bonds).
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    if len(atoms):
+        rows = _fill(_CML_ROW, [np.arange(1, len(atoms) + 1), atoms,
+                                coords[:, 0], coords[:, 1], coords[:, 2]], len(atoms))
+        body = '  <atomArray>\n' + rows + '  </atomArray>\n'
+    else:
+        body = '  <atomArray />\n'
+    return _output(_CML_HEAD + body + _CML_TAIL, f)
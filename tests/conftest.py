@@ -4,10 +4,26 @@
 # Stdlib
 from __future__ import division, print_function
 import os
+from collections import OrderedDict
+import pytest
+from esigen import markup, templating
 
 
 TESTPATH = os.path.dirname(os.path.abspath(__file__))
 
 
 def datapath(path):
-    return os.path.join(TESTPATH, 'data', path)
\ No newline at end of file
+    return os.path.join(TESTPATH, 'data', path)
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmpdir_factory, monkeypatch):
+    """
+    Keep the caches of each test apart: nothing is written to the user's
+    cache directory, and templates or HTML cached by other tests are not
+    reused.
+    """
+    monkeypatch.setenv('ESIGEN_CACHE_DIR', str(tmpdir_factory.mktemp('cache')))
+    monkeypatch.setattr(templating, '_ENVIRONMENTS', {})
+    monkeypatch.setattr(templating, '_STRING_TEMPLATES', OrderedDict())
+    monkeypatch.setattr(markup, '_HTML', OrderedDict())
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+from esigen import ESIgenReport
+from esigen.batch import process
+from conftest import datapath
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch(processes, tmpdir):
+    broken = tmpdir.join('broken.log')
+    broken.write('Not a logfile\n')
+    paths = [datapath('opt_amber.log'), str(broken), datapath('sp_232_exechanges_m06.out')]
+    results = list(process(paths, 'chemshell.md', processes=processes, ordered=True))
+    assert [r.path for r in results] == paths
+    assert results[1].error and results[1].molecule is None
+    for result in results[::2]:
+        assert result.error is None
+        assert result.report == ESIgenReport(result.path).report('chemshell.md')
+        assert result.molecule.data_as_dict()['scfenergies'][-1] < 0
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import os
+import pytest
+import numpy as np
+from esigen import ESIgenReport
+from esigen.cache import ParseCache
+from esigen.io import ccDataExtended
+from conftest import datapath
+
+
+@pytest.mark.parametrize('path', ['opt_amber.log', 'sp_232_exechanges_m06.out'])
+def test_cache_roundtrip(path, tmpdir):
+    cache = ParseCache(str(tmpdir))
+    cold = ESIgenReport(datapath(path), cache=cache)
+    assert os.path.isdir(cache.entry(cold._cache_key))
+    warm = ESIgenReport(datapath(path), cache=cache)
+    assert isinstance(warm.data.scfenergies, np.memmap)
+    assert sorted(cold.data_as_dict()) == sorted(warm.data_as_dict())
+    assert (cold.data.scfenergies == warm.data.scfenergies).all()
+    assert cold.report(template='chemshell.md') == warm.report(template='chemshell.md')
+
+
+def test_cache_key_depends_on_contents(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    copy = tmpdir.join('copy.log')
+    with open(datapath('opt_amber.log')) as f:
+        copy.write(f.read())
+    key = cache.key(str(copy), ccDataExtended)
+    assert key == cache.key(datapath('opt_amber.log'), ccDataExtended)
+    copy.write('\n', mode='a')
+    assert key != cache.key(str(copy), ccDataExtended)
+
+
+@pytest.mark.parametrize('option', [['--cache'], ['--cache-dir', None]])
+def test_cli_cache(option, tmpdir, monkeypatch, capsys):
+    from esigen import cli, core
+    monkeypatch.setenv('ESIGEN_CACHE_DIR', str(tmpdir))
+    option = [str(tmpdir) if arg is None else arg for arg in option]
+    paths = [datapath('opt_amber.log'), datapath('sp_232_exechanges_m06.out')]
+    # The option does not take the first path as its directory
+    monkeypatch.setattr('sys.argv', ['esigen', '-q', '-t', 'chemshell.md'] + option + paths)
+    cli.main()
+    first = capsys.readouterr().out
+    assert '# opt_amber' in first and '# sp_232_exechanges_m06' in first
+    entries = [key for d in os.listdir(str(tmpdir)) if len(d) == 2
+               for key in os.listdir(str(tmpdir.join(d)))]
+    assert len(entries) == 2
+
+    def not_parsed(*args, **kwargs):
+        raise AssertionError('The second run should be served from the cache')
+    monkeypatch.setattr(core, 'sniff', not_parsed)
+    cli.main()
+    assert capsys.readouterr().out == first
+
+
+def test_partial_parse_keys(tmpdir):
+    cache = ParseCache(str(tmpdir))
+    partial = ESIgenReport(datapath('opt_amber.log'), cache=cache, fields=['scfenergies'])
+    assert os.path.isdir(cache.entry(partial._cache_key))
+    assert partial._cache_key != cache.key(datapath('opt_amber.log'), ccDataExtended)
+    # Complete parses serve partial reports
+    full = ESIgenReport(datapath('sp_232_exechanges_m06.out'), cache=cache)
+    other = ESIgenReport(datapath('sp_232_exechanges_m06.out'), cache=cache, fields=['scfenergies'])
+    assert not os.path.isdir(cache.entry(other._cache_key))
+    assert (other.data.scfenergies == full.data.scfenergies).all()
+    assert not hasattr(other.data, 'mmenergies')
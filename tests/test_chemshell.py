@@ -4,7 +4,9 @@
 # Stdlib
 from __future__ import division, print_function
 import pytest
+import numpy as np
 from esigen import ESIgenReport
+from esigen.io import EnergyTable
 from conftest import datapath
 
 @pytest.mark.parametrize('path, value', [
@@ -13,4 +15,29 @@ from conftest import datapath
 ])
 def test_qmmm_energy(path, value):
     p = ESIgenReport(datapath(path))
-    assert p.data_as_dict()['scfenergies'][-1] == value
\ No newline at end of file
+    assert p.data_as_dict()['scfenergies'][-1] == value
+
+
+def test_energy_tables():
+    data = ESIgenReport(datapath('opt_amber.log')).data
+    mm = data.mmenergies
+    assert isinstance(mm, EnergyTable)
+    assert mm.values.shape == (len(mm), len(mm.keys))
+    assert mm.keys[0] == 'total'
+    assert np.array_equal(mm.column('total'), [row['total'] for row in mm])
+    assert mm[-1] is mm[len(mm) - 1]
+    contributions = data.energycontributions
+    assert set(contributions[-1]) <= set(contributions.keys)
+
+
+def test_energy_table_from_rows():
+    table = EnergyTable([{'a': 1.0}, {'a': 2.0, 'b': 3.0}])
+    assert table.keys == ('a', 'b')
+    assert np.isnan(table.values[0, 1])
+    assert table.tolist() == [{'a': 1.0}, {'a': 2.0, 'b': 3.0}]
+    assert table[1:] == [{'a': 2.0, 'b': 3.0}]
+
+
+def test_chemshell_template_is_repeatable():
+    report = ESIgenReport(datapath('opt_amber.log'))
+    assert report.report('chemshell.md') == report.report('chemshell.md')
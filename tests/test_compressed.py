@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import gzip
+import bz2
+import pytest
+from esigen import ESIgenReport
+from conftest import datapath
+
+lzma = pytest.importorskip('lzma')
+
+
+@pytest.mark.parametrize('ext, opener', [('.gz', gzip.open), ('.bz2', bz2.BZ2File),
+                                         ('.xz', lzma.open)])
+def test_compressed(ext, opener, tmpdir):
+    path = str(tmpdir.join('opt_amber.log' + ext))
+    with open(datapath('opt_amber.log'), 'rb') as f, opener(path, 'wb') as compressed:
+        compressed.write(f.read())
+    plain = ESIgenReport(datapath('opt_amber.log'))
+    report = ESIgenReport(path, quick=True)
+    assert report.name == 'opt_amber'
+    assert not report.quick
+    assert report.report(template='chemshell.md') == plain.report(template='chemshell.md')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pickle
+import numpy as np
+from esigen import ESIgenReport
+from esigen.io import ccDataExtended
+from conftest import datapath
+
+
+def methane():
+    data = ccDataExtended(attributes={
+        'natom': 5, 'charge': 0, 'mult': 1, 'atomnos': [6, 1, 1, 1, 1],
+        'atomcoords': [[[0.0, 0.0, 0.0], [0.63, 0.63, 0.63], [-0.63, -0.63, 0.63],
+                        [-0.63, 0.63, -0.63], [0.63, -0.63, -0.63]]]})
+    data.arrayify()
+    return data
+
+
+def test_derived_values_are_reused():
+    data = methane()
+    assert data.as_dict() is data.as_dict()
+    assert data.atoms is data.atoms
+    assert data.xyz_block is data.cartesians
+    assert data.stoichiometry == 'CH4'
+
+
+def test_derived_values_follow_changes():
+    data = methane()
+    stoichiometry, block, as_dict = data.stoichiometry, data.xyz_block, data.as_dict()
+    data.atomcoords = data.atomcoords + 1.0
+    assert data.stoichiometry is stoichiometry
+    assert data.xyz_block != block
+    assert data.as_dict() is not as_dict
+    assert np.allclose(data.as_dict()['coordinates'], data.atomcoords[-1])
+    del data.atomnos
+    assert data.as_dict()['atoms'] is None
+
+
+def test_data_as_dict_copies():
+    data = methane()
+    report = ESIgenReport(datapath('opt_amber.log'), parser=lambda *a, **kw: data,
+                          missing='N/A')
+    d = report.data_as_dict()
+    assert d['solvent'] == 'N/A'
+    d['stoichiometry'] = None
+    assert report.data_as_dict()['stoichiometry'] == 'CH4'
+    assert pickle.loads(pickle.dumps(data)).xyz_block == data.xyz_block
+
+
+def test_stoichiometry():
+    from cclib.method import Nuclear
+    data = methane()
+    data.atomnos = np.array([8, 1, 6, 17, 1, 35, 6, 1])
+    data.charge = -2
+    assert data.stoichiometry == Nuclear(data).stoichiometry() == 'C2H3BrClO(-2)'
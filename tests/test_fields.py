@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+from esigen import ESIgenReport
+from esigen.core import template_fields
+from conftest import datapath
+
+
+@pytest.mark.parametrize('template', ['default.md', 'chemshell.md'])
+def test_template_fields(template):
+    full = ESIgenReport(datapath('opt_amber.log'))
+    partial = ESIgenReport(datapath('opt_amber.log'), fields=template_fields(template))
+    assert set(partial.data_as_dict()) <= set(full.data_as_dict())
+    assert partial.report(template=template) == full.report(template=template)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import os
+import subprocess
+import sys
+from conftest import TESTPATH
+
+HEAVY = ('cclib', 'numpy', 'jinja2', 'markdown', 'pymol')
+
+
+def imported_after(statement):
+    code = '{}; import sys; print(sorted(m for m in {!r} if m in sys.modules))'.format(
+        statement, HEAVY)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(TESTPATH))
+    return subprocess.check_output([sys.executable, '-c', code], env=env).decode().strip()
+
+
+def test_cli_cold_start():
+    assert imported_after('import esigen, esigen.cli') == '[]'
+    assert imported_after('from esigen.templating import template_variables') == '[]'
+
+
+def test_lazy_attributes():
+    assert imported_after('from esigen import ESIgenReport') != '[]'
+    assert imported_after('import esigen; esigen.__version__') == '[]'
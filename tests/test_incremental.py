@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+import numpy as np
+from esigen import ESIgenReport
+from esigen.incremental import ResumableParser
+from conftest import datapath
+
+
+@pytest.mark.parametrize('path', ['opt_amber.log', 'sp_232_exechanges_m06.out'])
+def test_resume_growing_file(path, tmpdir):
+    with open(datapath(path), 'rb') as f:
+        contents = f.read()
+    growing = tmpdir.mkdir('running').join(path)
+    states = str(tmpdir.join('states'))
+    consumed = []
+    for fraction in (0.3, 0.6, 0.99, 1):
+        growing.write(contents[:int(len(contents) * fraction)], mode='wb')
+        report = ESIgenReport(str(growing), resume=states)
+        consumed.append(len(report.data.scfenergies))
+    assert consumed == sorted(consumed)
+    full = ESIgenReport(datapath(path))
+    assert sorted(report.data_as_dict()) == sorted(full.data_as_dict())
+    assert (report.data.scfenergies == full.data.scfenergies).all()
+    assert report.report(template='chemshell.md') == full.report(template='chemshell.md')
+
+
+def test_resume_incomplete_step(tmpdir):
+    with open(datapath('opt_amber.log')) as f:
+        lines = f.readlines()
+    energy = max(i for (i, line) in enumerate(lines) if line.startswith('QM/MM Energy:'))
+    growing = tmpdir.join('growing.log')
+    growing.write(''.join(lines[:energy]))
+    resumable = ResumableParser(str(growing))
+    resumable.update()
+    n = len(resumable.parse().scfenergies)
+    assert resumable.offset < growing.size()
+    growing.write(lines[energy], mode='a')
+    assert resumable.update()
+    assert resumable.offset == growing.size()
+    assert len(resumable.parse().scfenergies) == n + 1
+
+
+def test_resume_state_not_saved(tmpdir):
+    # The state cannot be saved under a file, but the parse goes on
+    blocker = tmpdir.join('blocker')
+    blocker.write('')
+    report = ESIgenReport(datapath('opt_amber.log'), resume=str(blocker.join('states')))
+    assert len(report.data.scfenergies) == len(ESIgenReport(datapath('opt_amber.log')).data.scfenergies)
+
+
+def test_cli_resume(tmpdir, monkeypatch, capsys):
+    from esigen import cli
+    paths = [datapath('opt_amber.log'), datapath('sp_232_exechanges_m06.out')]
+    states = tmpdir.join('states')
+    for option in (['--resume'], ['--resume-dir', str(states)]):
+        monkeypatch.setattr('sys.argv', ['esigen', '-q', '-t', 'chemshell.md'] + option + paths)
+        cli.main()
+        out = capsys.readouterr().out
+        assert '# opt_amber' in out and '# sp_232_exechanges_m06' in out
+    assert len(states.listdir()) == 2
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import os
+import pytest
+from esigen import ESIgenReport
+from esigen.io import GaussianParser, ChemShell, split_jobs
+from conftest import datapath
+
+
+def test_split_jobs(tmpdir):
+    jobs = [' Entering Gaussian System\n Normal termination of Gaussian 09\n',
+            ' Link1:  Proceeding to internal job step number  2.\n'
+            ' Error termination via Lnk1e\n',
+            ' Link1:  Proceeding to internal job step number  3.\n']
+    logfile = tmpdir.join('link1.log')
+    logfile.write(''.join(jobs))
+    ranges = split_jobs(str(logfile), GaussianParser)
+    assert [logfile.read()[start:end] for (start, end) in ranges] == jobs
+    # Trailing blank lines do not make a new job
+    logfile.write(''.join(jobs[:2]) + '\n \n')
+    assert len(split_jobs(str(logfile), GaussianParser)) == 2
+
+
+FAILED_JOB = """\
+ Entering Gaussian System, Link 0=g16
+ Entering Link 1 = l1.exe PID=      1234.
+ SCF Done:  E(RB3LYP) =  -40.5183787     A.U. after    9 cycles
+ Error termination request processed by link 9999.
+ Error termination via Lnk1e in l9999.exe at Mon Aug 25 21:25:43 2025.
+ Job cpu time:       0 days  0 hours  1 minutes 12.3 seconds.
+ Elapsed time:       0 days  0 hours  0 minutes 18.1 seconds.
+ File lengths (MBytes):  RWF=     17 Int=      0 D2E=      0 Chk=      2 Scr=      1
+"""
+
+
+def test_failed_job(tmpdir):
+    logfile = tmpdir.join('failed.log')
+    logfile.write(FAILED_JOB)
+    assert split_jobs(str(logfile), GaussianParser) == [(0, len(FAILED_JOB))]
+    # A failed job followed by another one: the trailing lines of the first
+    # one stay with it
+    second = ' Link1:  Proceeding to internal job step number  2.\n Normal termination of Gaussian 16\n'
+    logfile.write(FAILED_JOB + second)
+    assert split_jobs(str(logfile), GaussianParser) == [(0, len(FAILED_JOB)),
+                                                        (len(FAILED_JOB), len(FAILED_JOB + second))]
+
+
+def test_single_job():
+    size = os.path.getsize(datapath('opt_amber.log'))
+    assert split_jobs(datapath('opt_amber.log'), ChemShell) == [(0, size)]
+    reports = ESIgenReport.from_jobs(datapath('opt_amber.log'))
+    assert len(reports) == 1
+    assert reports[0].report() == ESIgenReport(datapath('opt_amber.log')).report()
+
+
+def test_cli_split_jobs(monkeypatch, capsys):
+    from esigen import cli, core
+    parse_jobs, calls = core.parse_jobs, []
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs['processes'])
+        return parse_jobs(*args, **kwargs)
+    monkeypatch.setattr(core, 'parse_jobs', counted)
+    monkeypatch.setattr('sys.argv', ['esigen', '-q', '--split', '-j', '1', '-t', 'simple.md',
+                                     datapath('meoh_opt_freq.log')])
+    cli.main()
+    assert calls == [1]
+    out = capsys.readouterr().out
+    assert 'meoh_opt_freq.1' in out and 'meoh_opt_freq.2' in out
+
+
+@pytest.mark.parametrize('option', [['--cache'], ['--cache-dir', 'cache'], ['--quick'],
+                                    ['--resume'], ['--resume-dir', 'state'],
+                                    ['--profile-parser']])
+def test_cli_split_unsupported(option, monkeypatch, capsys):
+    from esigen import cli
+    monkeypatch.setattr('sys.argv', ['esigen', '-q', '--split'] + option +
+                        [datapath('meoh_opt_freq.log')])
+    with pytest.raises(SystemExit):
+        cli.main()
+    assert '--split cannot be combined with ' + option[0] in capsys.readouterr().err
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import io
+import pytest
+from esigen.utils import MappedLogfile
+from conftest import datapath
+
+
+@pytest.mark.parametrize('blocksize', [1, 7, 1 << 18])
+def test_same_lines_as_text_mode(blocksize, tmpdir):
+    path = str(tmpdir.join('mixed.log'))
+    with open(path, 'wb') as f:
+        f.write(b'first\r\nsecond\rthird\n\xff\xfebroken\nform\x0cfeed\n\nlast')
+    with io.open(path, errors='ignore') as f:
+        expected = list(f)
+    with MappedLogfile(path, blocksize=blocksize) as stream:
+        assert list(stream) == expected
+
+
+def test_range():
+    path = datapath('opt_amber.log')
+    with open(path, 'rb') as f:
+        contents = f.read()
+    start = contents.index(b'\n', 1000) + 1
+    end = contents.index(b'\n', 5000) + 1
+    with MappedLogfile(path, start, end) as stream:
+        assert ''.join(stream) == contents[start:end].decode('utf-8')
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import os
+from markdown import markdown
+from esigen import ESIgenReport, markup
+from esigen.markup import MARKDOWN_EXTENSIONS, markdown_to_html
+from conftest import datapath
+
+
+def _texts():
+    report = ESIgenReport(datapath('opt_amber.log'), missing='N/A')
+    texts = [report.report(template) for template in ('default.md', 'chemshell.md')]
+    return report, texts, [markdown(text, extensions=list(MARKDOWN_EXTENSIONS)) for text in texts]
+
+
+def test_markdown_to_html(monkeypatch):
+    report, texts, expected = _texts()
+    # The pooled converter is reset between uses
+    assert [markdown_to_html(text, cache=False) for text in texts * 2] == expected * 2
+    assert [markdown_to_html(text) for text in texts] == expected
+    assert report.report('chemshell.md', process_markdown=True) == expected[1]
+    # Cached results are not converted again, and the cache is bounded
+    monkeypatch.setattr(markup, '_converter', None)
+    assert [markdown_to_html(text) for text in texts] == expected
+    monkeypatch.setattr(markup, 'HTML_CACHE_SIZE', 1)
+    markdown_to_html(texts[1])
+    assert list(markup._HTML) == [markup._key(texts[1])]
+
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import io
+import json
+import logging
+import numpy as np
+from esigen.io import GaussianParser
+
+DEFINITIONS = """\
+ ! R4    R(1,5)                  1.47           Scan                            !
+ ! A2    A(2,1,4)              109.4712         Scan                            !
+"""
+
+STEP = """\
+ Variable       Old X    -DE/DX   Delta X   Delta X   Delta X     New X
+                                 (Linear)    (Quad)   (Total)
+    R1        2.02201   0.02142   0.00000   0.05597   0.05597   2.07797
+    R4        2.77790   {:.5f}   0.00000   0.02612   0.02612   2.80402
+    A2        1.91063  {:.5f}   0.00000  -0.01890  -0.01929   1.89134
+         Item               Value     Threshold  Converged?
+ Maximum Force            0.021420     0.000450     NO
+ RMS     Force            0.012345     0.000300     NO
+ Maximum Displacement     0.055970     0.001800     NO
+ RMS     Displacement     0.034567     0.001200     NO
+"""
+
+OPTIMIZED = """\
+                           !   Optimized Parameters   !
+                           ! (Angstroms and Degrees)  !
+ --------------------------                            --------------------------
+ ! Name  Definition              Value          Derivative Info.                !
+ --------------------------------------------------------------------------------
+ ! R1    R(1,2)                  1.099          -DE/DX =    0.0                 !
+ ! R4    R(1,5)                  {:.4f}         -DE/DX =    0.0                 !
+ ! A2    A(2,1,4)              108.0248         -DE/DX =    0.0                 !
+ --------------------------------------------------------------------------------
+"""
+
+
+def parse(text):
+    parser = GaussianParser(io.StringIO(text), loglevel=logging.CRITICAL)
+    data = parser.parse()
+    assert not parser.parse_errors
+    return data
+
+
+def test_modredundant_arrays():
+    text = DEFINITIONS
+    for point in range(2):
+        for step in range(point + 2):
+            text += STEP.format(0.001 * step, -0.002 * step)
+        text += OPTIMIZED.format(1.5 + 0.1 * point)
+    data = parse(text)
+    assert data.modredvars == ['R4', 'A2']
+    assert data.modreddefs == [[0, 4], [1, 0, 3]]
+    assert [e.shape for e in data.modredenergies] == [(2, 2), (3, 2), (0, 2)]
+    assert np.allclose(data.modredenergies[1][:, 1], [0, -0.002, -0.004])
+    assert np.allclose(data.modredvalues, [[1.5, 108.0248], [1.6, 108.0248]])
+
+
+def test_incomplete_scan_json():
+    from esigen.web import NumpyJSONEncoder
+    # A2 is not printed in the second step
+    data = parse(DEFINITIONS + STEP.format(0.001, -0.002) +
+                 ''.join(line for line in STEP.format(0.003, 0).splitlines(True)
+                         if not line.startswith('    A2')))
+    text = json.dumps(data.modredenergies, cls=NumpyJSONEncoder, allow_nan=False)
+    assert json.loads(text) == [[[0.001, -0.002], [0.003, None]]]
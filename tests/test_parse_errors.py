@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import logging
+import pickle
+import pytest
+from esigen import ESIgenReport
+from esigen.batch import process
+from esigen.io import ParseErrors
+from conftest import datapath
+
+# 'beta electrons' is missing from these lines
+MALFORMED = (" Gaussian, Inc.  All Rights Reserved.\n" +
+             "    5 alpha electrons\n" * 100 +
+             " Normal termination of Gaussian 16\n")
+
+
+def test_parse_errors_are_aggregated(tmpdir, caplog):
+    path = tmpdir.join('malformed.log')
+    path.write(MALFORMED)
+    with caplog.at_level(logging.ERROR):
+        report = ESIgenReport(str(path))
+    assert report.parse_errors == [
+        dict(handler='_extract_electrons', exception='ValueError', count=100,
+             samples=[("'beta' is not in list", '    5 alpha electrons')] * 3)]
+    # Three samples and a summary of the rest, named after the file
+    assert len(caplog.records) == 4
+    assert set(record.name for record in caplog.records) == {'Gaussian ' + str(path)}
+    assert '97 more ValueError errors' in caplog.records[-1].getMessage()
+
+
+def test_parse_errors_pickle():
+    errors = ParseErrors(logging.getLogger('esigen.test'), samples=1)
+    errors.add('cclib', IndexError('list index out of range'), ' SCF Done:\n')
+    errors.add('cclib', IndexError('list index out of range'), ' SCF Done:\n')
+    restored = pickle.loads(pickle.dumps(errors))
+    assert restored.logger is errors.logger
+    assert len(restored) == 2
+    assert restored.summary()[0]['samples'] == [('list index out of range', ' SCF Done:')]
+
+
+def test_no_parse_errors():
+    assert ESIgenReport(datapath('opt_amber.log')).parse_errors == []
+
+
+def test_chemshell_parse_errors(tmpdir):
+    path = tmpdir.join('malformed_chemshell.log')
+    path.write('ChemShell 3.7\nQM/MM Energy: -1183.79\nQM/MM Energy: ***\nQM/MM Energy: -1183.80\n')
+    report = ESIgenReport(str(path), loglevel=logging.CRITICAL)
+    assert report.data.scfenergies.shape == (2,)
+    assert [(e['handler'], e['exception'], e['count']) for e in report.parse_errors] == [
+        ('ChemShell', 'ValueError', 1)]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_parse_errors(processes, tmpdir, monkeypatch, capsys):
+    from esigen import cli
+    path = tmpdir.join('malformed.log')
+    path.write(MALFORMED)
+    paths = [str(path), datapath('opt_amber.log')]
+    results = list(process(paths, 'chemshell.md', processes=processes, ordered=True,
+                           reporter_kwargs=dict(loglevel=logging.CRITICAL)))
+    assert results[0].molecule.parse_errors[0]['count'] == 100
+    assert results[1].molecule.parse_errors == []
+    # The CLI tells which files were not parsed in full
+    template = tmpdir.join('electrons.md')
+    template.write('{{ name }}: {{ alphaelectrons }}')
+    monkeypatch.setattr('sys.argv', ['esigen', '-q', '-j', str(processes), '-t', str(template)]
+                        + paths)
+    cli.main()
+    err = capsys.readouterr().err
+    assert '100 ValueError in _extract_electrons' in err and 'opt_amber' not in err
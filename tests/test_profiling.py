@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import numpy as np
+from esigen import ESIgenReport
+from conftest import datapath
+
+
+def test_parse_profile():
+    path = datapath('opt_amber.log')
+    report = ESIgenReport(path, profile=True)
+    profile = report.parse_profile
+    rows = profile.rows()
+    assert [row[3] for row in rows] == sorted((row[3] for row in rows), reverse=True)
+    # Every line is either given to the parser or consumed by a handler
+    with open(path) as f:
+        assert profile.lines + sum(row[2] for row in rows) == sum(1 for _ in f)
+    assert 'ChemShell: MM Energies (kcal/mol) total' in profile.stats
+    assert profile.elapsed > 0
+    assert 'Handler' in profile.table(limit=1)
+    assert np.array_equal(report.data.scfenergies, ESIgenReport(path).data.scfenergies)
+
+
+def test_no_parse_profile_by_default():
+    assert ESIgenReport(datapath('opt_amber.log')).parse_profile is None
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+import esigen.io
+from esigen import ESIgenReport
+from esigen.io import ChemShell, GaussianParser, parse_tail
+from conftest import datapath
+
+
+@pytest.mark.parametrize('path', ['opt_amber.log', 'sp_232_exechanges_m06.out'])
+def test_quick_mode(path):
+    full = ESIgenReport(datapath(path))
+    quick = ESIgenReport(datapath(path), quick=True)
+    assert quick.quick and not full.quick
+    assert quick.data.electronic_energy == full.data.electronic_energy
+    assert getattr(quick.data, 'optdone', None) == getattr(full.data, 'optdone', None)
+
+
+def test_quick_mode_small_blocks():
+    data = parse_tail(datapath('opt_amber.log'), ChemShell, blocksize=64)
+    assert data.scfenergies.shape == (1,)
+    assert data.optdone
+
+
+def test_quick_mode_fallback(tmpdir):
+    truncated = tmpdir.join('truncated.log')
+    with open(datapath('opt_amber.log')) as f:
+        truncated.write(''.join(f.readlines()[:100]))
+    assert parse_tail(str(truncated), ChemShell) is None
+    assert not ESIgenReport(str(truncated), quick=True).quick
+
+
+def test_quick_mode_opt_freq(tmpdir):
+    # Gaussian 09 repeats the optimization status in the frequencies job
+    # of opt+freq (--Link1--) files, but Gaussian 16 does not
+    path = datapath('meoh_opt_freq.log')
+    assert parse_tail(path, GaussianParser).optdone
+    with open(path) as f:
+        lines = f.readlines()
+    last = max(i for i, line in enumerate(lines) if 'Optimization completed' in line)
+    g16 = tmpdir.join('meoh_opt_freq_g16.log')
+    g16.write(''.join(lines[:last] + lines[last + 2:]))
+    assert parse_tail(str(g16), GaussianParser) is None
+    quick = ESIgenReport(str(g16), quick=True)
+    assert not quick.quick and quick.data.optdone
+
+
+def test_quick_mode_single_point(tmpdir, monkeypatch):
+    # The frequencies job of meoh_opt_freq.log, after a long output that
+    # must not be read to tell whether the job follows an optimization
+    with open(datapath('meoh_opt_freq.log')) as f:
+        lines = f.readlines()
+    lines = [line for line in lines[445:] if 'Optimization completed' not in line]
+    sp = tmpdir.join('sp.log')
+    sp.write(''.join([' Entering Link 1 = l1.exe\n'] + [' Filler\n'] * 250000 + lines))
+    read = []
+
+    class CountingFile(object):
+        def __init__(self, f):
+            self.f = f
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            self.f.close()
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+        def read(self, *args):
+            chunk = self.f.read(*args)
+            read.append(len(chunk))
+            return chunk
+
+    builtin = open
+    monkeypatch.delattr(esigen.io.mmap, 'mmap')
+    monkeypatch.setattr(esigen.io, 'open', lambda *a, **kw: CountingFile(builtin(*a, **kw)),
+                        raising=False)
+    data = parse_tail(str(sp), GaussianParser, blocksize=1 << 14)
+    assert data is not None and getattr(data, 'optdone', None) is None
+    assert sum(read) < 8 * (1 << 14) < sp.size() // 10
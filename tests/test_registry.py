@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+from esigen import registry
+from esigen.io import ChemShell, GaussianParser
+
+
+def test_builtin_entries():
+    assert registry.find_parser([' Gaussian, Inc.  All Rights Reserved.\n']) is GaussianParser
+    assert registry.find_parser(['ChemShell 3.7\n']) is ChemShell
+    assert registry.find_parser(['Nothing to see here\n']) is None
+
+
+def test_cclib_entries():
+    # GAMESS-UK files also contain the GAMESS trigger, which does not break
+    lines = ['GAMESS\n', 'G A M E S S - U K\n', 'GAMESS\n']
+    assert registry.find_entry(lines).name == 'GAMESSUK'
+    assert registry.find_entry(['GAMESS\n', 'GAMESS\n']).name == 'GAMESS'
+
+
+@pytest.fixture
+def custom_entry():
+    entry = registry.register('Custom', 'esigen.io:NotImportedYet',
+                              sniff=lambda line: line.startswith('custom program'))
+    yield entry
+    registry.unregister('Custom')
+
+
+def test_custom_entry_is_lazy(custom_entry):
+    assert custom_entry in registry.registered()
+    assert registry.find_entry(['Gaussian, Inc.\n']).name == 'Gaussian'
+    assert not custom_entry.loaded
+    assert registry.find_entry(['Custom Program v1\n']) is custom_entry
+    with pytest.raises(AttributeError):
+        custom_entry.load()
+
+
+def test_replace_entry():
+    try:
+        registry.register('Gaussian', ChemShell, phrases=['Gaussian, Inc.'])
+        assert registry.find_parser(['Gaussian, Inc.\n']) is ChemShell
+    finally:
+        registry.register('Gaussian', 'esigen.io:GaussianParser', phrases=['Gaussian, Inc.'])
+    assert registry.find_parser(['Gaussian, Inc.\n']) is GaussianParser
+
+
+def test_registered_entries_take_precedence():
+    # cclib picks the trigger found first; registered entries win anyway
+    from cclib.io.ccio import guess_filetype
+    from cclib.parser import Turbomole
+    lines = [' scratch: /scratch/turbomole_vs_g16/job42\n',
+             ' Copyright (c) 1988-2017, Gaussian, Inc.  All Rights Reserved.\n']
+    assert guess_filetype(lines) is Turbomole
+    assert registry.find_parser(lines) is GaussianParser
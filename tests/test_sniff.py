@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import pytest
+from esigen import ESIgenReport, registry
+from esigen.io import ChemShell, guess_parser, sniff
+from conftest import datapath
+
+
+def test_sniff_replays_prefix():
+    parser, stream = sniff(datapath('sp_232_exechanges_m06.out'), limit=100)
+    with stream:
+        text = stream.read()
+    with open(datapath('sp_232_exechanges_m06.out')) as f:
+        assert text == f.read()
+    assert parser is ChemShell
+
+
+def test_sniff_limit(tmpdir):
+    path = str(tmpdir.join('padded.out'))
+    with open(datapath('sp_232_exechanges_m06.out')) as f, open(path, 'w') as padded:
+        padded.write('\n' * 1000 + f.read())
+    assert guess_parser(path) is ChemShell
+    assert guess_parser(path, limit=500) is None
+    with pytest.raises(ValueError):
+        ESIgenReport(path, sniff_limit=500)
+
+
+def test_sniff_limit_cuts_line(tmpdir):
+    path = str(tmpdir.join('custom.out'))
+    with open(path, 'w') as f:
+        f.write('custom program v1\n' + 'Nothing to see here\n' * 10)
+    registry.register('Custom', ChemShell, sniff=lambda line: line.rstrip() == 'custom program')
+    try:
+        # 'custom ' is completed up to 'custom program', which is still cut
+        assert guess_parser(path, limit=7) is None
+        assert guess_parser(path) is None
+    finally:
+        registry.unregister('Custom')
+
+
+def test_unparsable(tmpdir):
+    path = str(tmpdir.join('junk.out'))
+    with open(path, 'w') as f:
+        f.write('Nothing to see here\n' * 500000)
+    with pytest.raises(ValueError):
+        ESIgenReport(path)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import io
+import json
+import shutil
+from io import BytesIO
+from zipfile import ZipFile
+import pytest
+from esigen import ESIgenReport
+from esigen.batch import process
+from conftest import datapath
+
+
+@pytest.mark.parametrize('template', ['default.md', 'chemshell.md'])
+def test_generate(template):
+    report = ESIgenReport(datapath('opt_amber.log'), missing='N/A')
+    chunks = list(report.generate(template))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == report.report(template)
+    f = io.StringIO()
+    report.write_report(f, template)
+    assert f.getvalue() == report.report(template)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_output(processes, tmpdir):
+    # Same name, different extension: each one gets its own file
+    copy = tmpdir.join('opt_amber.out')
+    shutil.copy(datapath('opt_amber.log'), str(copy))
+    paths = [datapath('opt_amber.log'), str(copy)]
+    results = list(process(paths, 'chemshell.md', processes=processes, ordered=True,
+                           output=str(tmpdir)))
+    assert [r.report for r in results] == [str(tmpdir.join('opt_amber.md')),
+                                           str(tmpdir.join('opt_amber_1.md'))]
+    expected = ESIgenReport(paths[0]).report('chemshell.md')
+    for result in results:
+        with io.open(result.report, encoding='utf-8') as f:
+            assert f.read() == expected
+
+
+def test_web_exports(tmpdir, monkeypatch):
+    from esigen import web
+    monkeypatch.setattr(web, 'UPLOADS', str(tmpdir))
+    root = tmpdir.mkdir('upload')
+    shutil.copy(datapath('opt_amber.log'), str(root))
+    client = web.app.test_client()
+    # The data of partial parses is not offered for download
+    assert client.get('/report/upload/').status_code == 200
+    assert not root.join('opt_amber.json').check() and not root.join('opt_amber.cjson').check()
+    data = json.loads(client.get('/report/upload/json').data.decode('utf-8'))
+    molecule = ESIgenReport(datapath('opt_amber.log'), missing='N/A')
+    assert data['opt_amber.log']['report'] == molecule.report('default.md')
+    assert data['opt_amber.log']['data']['mmenergies'] == molecule.data_as_dict()['mmenergies'].tolist()
+    with io.open(str(root.join('opt_amber.json')), encoding='utf-8') as f:
+        assert json.load(f) == {'opt_amber.log': data['opt_amber.log']['data']}
+    # Responses are spooled only for the engines that need them
+    assert not root.join(web.EXPORTS).listdir()
+    shutil.copy(datapath('meoh_opt_freq.log'), str(root))
+    trajectory = client.get('/report/upload/trajectory').data.decode('utf-8')
+    meoh = ESIgenReport(datapath('meoh_opt_freq.log'))
+    assert trajectory == ''.join(meoh.data.xyz_trajectory(label='meoh_opt_freq step'))
+    client.get('/report/upload/')
+    assert not root.join(web.EXPORTS).listdir()
+    archive = ZipFile(BytesIO(client.get('/report/upload/zip').data))
+    names = archive.namelist()
+    assert 'opt_amber.md' in names and 'opt_amber.json' in names and 'meoh_opt_freq.pdb' in names
+    assert len(names) == len(set(names))
+    assert not [name for name in names if name.endswith('.trajectory.xyz')]
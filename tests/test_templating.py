@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import os
+import pytest
+from jinja2.exceptions import SecurityError
+from esigen import ESIgenReport
+from esigen import templating
+from conftest import datapath
+
+
+def test_shared_environment():
+    first = ESIgenReport(datapath('opt_amber.log'))
+    second = ESIgenReport(datapath('opt_amber.log'), missing='N/A')
+    assert first.jinja_env is second.jinja_env
+    assert templating.get_template('default.md') is templating.get_template('default.md')
+    # Per-report values are passed in the render context
+    assert second.report(template='{{ missing }}') == 'N/A'
+    assert first.report(template='{{ missing }}') == 'None'
+
+
+def test_string_templates_are_cached():
+    source = '{{ name }}: {{ mmenergies|length }} steps'
+    assert templating.get_template(source) is templating.get_template(source)
+    report = ESIgenReport(datapath('opt_amber.log'))
+    assert report.report(template=source) == 'opt_amber: 261 steps'
+
+
+def test_precompile_bytecode():
+    assert templating.precompile() == templating.BUILTIN_TEMPLATES
+    assert len(os.listdir(templating.template_cache_dir())) == len(templating.BUILTIN_TEMPLATES)
+    assert not os.path.isdir(templating.template_cache_dir(trusted=True))
+
+
+@pytest.mark.parametrize('template', ['default.md', 'chemshell.md', 'simple.md'])
+def test_trusted_render(template):
+    report = ESIgenReport(datapath('opt_amber.log'), missing='N/A')
+    assert report.report(template=template, trusted=True) == report.report(template=template)
+
+
+def test_sandbox_is_kept_by_default():
+    report = ESIgenReport(datapath('opt_amber.log'))
+    unsafe = '{{ name.__class__.__name__ }}'
+    with pytest.raises(SecurityError):
+        report.report(template=unsafe)
+    assert report.report(template=unsafe, trusted=True) == 'str'
+
+
+def test_template_info_index(tmpdir):
+    info = templating.template_info('default.md')
+    assert templating.template_info('default.md') is info
+    assert info.viewer3d and 'stoichiometry' in info.variables
+    assert info.fields() == templating.template_fields('default.md')
+    # Local files and strings with the same source share their entry
+    path = tmpdir.join('custom.md')
+    path.write('{{ image }} {{ name }}')
+    custom = templating.template_info(str(path))
+    assert templating.template_info('{{ image }} {{ name }}') is custom
+    assert custom.image and not custom.viewer3d
+    assert custom.variables == {'image', 'name'}
+    assert 'atomcoords' in custom.fields()
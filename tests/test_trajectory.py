@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import argparse
+import numpy as np
+import pytest
+from esigen.cli import frame_range
+from test_derived import methane
+
+
+@pytest.mark.parametrize('value, expected', [('3', [2]), ('2:4', [1, 2, 3]), ('5:', [4, 5]),
+                                             (':2', [0, 1]), ('::2', [0, 2, 4]),
+                                             ('2::3', [1, 4])])
+def test_frame_range(value, expected):
+    assert np.arange(6)[frame_range(value)].tolist() == expected
+
+
+@pytest.mark.parametrize('value', ['0', '1:2:3:4', 'a:b', '::0'])
+def test_bad_frame_range(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        frame_range(value)
+
+
+def test_xyz_trajectory():
+    data = methane()
+    data.atomcoords = np.array([data.atomcoords[0] + i for i in range(3)])
+    data.optstatus = np.array([1, 4, 0])
+    assert data.converged_frames.tolist() == [1]
+    text = ''.join(data.xyz_trajectory([0, 2], label='Scan'))
+    lines = text.splitlines()
+    assert lines[:2] == ['5', 'Scan 1'] and lines[7:9] == ['5', 'Scan 3']
+    assert '\n'.join(lines[9:]) == data.xyz_from(2)
+    assert ''.join(data.xyz_trajectory()).count('Step') == 3
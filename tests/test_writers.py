@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stdlib
+from __future__ import division, print_function
+import io
+import numpy as np
+from cclib.io import CML
+from esigen import writers
+from test_derived import methane
+
+
+def test_xyz():
+    data = methane()
+    expected = '\n'.join(['{:4} {: 15.6f} {: 15.6f} {: 15.6f}'.format(a, *xyz)
+                          for (a, xyz) in zip(data.atoms, data.coordinates)])
+    assert data.xyz_block == expected
+    f = io.StringIO()
+    writers.xyz(data.atoms, data.coordinates, f=f)
+    assert f.getvalue() == expected
+
+
+def test_xyz_frames():
+    data = methane()
+    frames = np.array([data.coordinates, data.coordinates + 1.0])
+    lines = writers.xyz_frames(data.atoms, frames).splitlines()
+    assert len(lines) == 2 * (data.natom + 2)
+    assert lines[0] == '5' and lines[1] == 'Frame 1' and lines[8] == 'Frame 2'
+    assert '\n'.join(lines[9:]) == writers.xyz(data.atoms, frames[1])
+
+
+def test_pdb():
+    lines = methane().pdb_block.splitlines()
+    assert lines[:2] == ['TITLE unknown', 'MODEL 1']
+    assert lines[2] == ('ATOM      1  C1  UNK     1       0.000   0.000   0.000'
+                        '  1.00  0.00           C  ')
+    assert lines[6] == ('ATOM      5  H4  UNK     1       0.630  -0.630  -0.630'
+                        '  1.00  0.00           H  ')
+    assert lines[7:] == ['ENDMDL', 'END']
+
+
+def test_cml():
+    data = methane()
+    assert writers.cml(data.atoms, data.coordinates) == CML(data).generate_repr()